@@ -9,187 +9,669 @@ AI时代个人智能中间层的自动化构建工具
 
 import os
 import sys
+import time
+import asyncio
+import inspect
+import importlib.util
 import json
+import queue
+import hashlib
+import logging
+import logging.handlers
+import pickle
+import shutil
 import subprocess
-import argparse
+from dataclasses import dataclass, field, fields
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 from datetime import datetime
 
+log = logging.getLogger("byenatos.build")
+
+# orjson可用时使用其C实现解析器，否则回退到标准库（json.loads同样接受bytes）
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 默认构建配置，模块加载时构建一次，只读
+_DEFAULT_CONFIG: Mapping = MappingProxyType({
+    "target_architectures": ("x86_64", "arm64"),
+    "build_types": ("debug", "release"),
+    "kernel_features": MappingProxyType({
+        "ai_scheduler": True,
+        "smart_memory": True,
+        "secure_boot": True,
+        "power_management": True
+    }),
+    "ui_frameworks": ("web", "native"),
+    "ai_models": MappingProxyType({
+        "language_model": "7b_chinese",
+        "voice_recognition": "whisper_optimized",
+        "computer_vision": "yolo_lite"
+    }),
+    "optimization_level": "O2",
+    "debug_symbols": True,
+    "test_coverage": True
+})
+
+
+_AI_SERVICES: Tuple[str, ...] = (
+    "NaturalLanguage",
+    "ComputerVision",
+    "PersonalAssistant",
+    "SmartAutomation",
+    "LearningEngine",
+)
+
+_TEST_TYPES: Tuple[str, ...] = (
+    "UnitTests",
+    "IntegrationTests",
+    "PerformanceTests",
+    "SecurityTests",
+    "AITests",
+)
+
+
+def _fingerprint(paths: Iterable[Path]) -> bytes:
+    """计算输入路径的指纹：遍历文件的(路径, mtime_ns, 大小)并做blake2b摘要"""
+    entries = []
+    stack = [os.fspath(path) for path in paths]
+    while stack:
+        current = stack.pop()
+        try:
+            if not os.path.isdir(current):
+                stat = os.stat(current)
+                entries.append((current, stat.st_mtime_ns, stat.st_size))
+                continue
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != "__pycache__":
+                            stack.append(entry.path)
+                    else:
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            continue
+    
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in sorted(entries):
+        digest.update(repr(entry).encode())
+    return digest.digest()
+
+
+@dataclass(frozen=True, slots=True)
+class BuildConfig:
+    """预解析的构建配置，构建步骤以属性访问代替逐次dict.get"""
+    target_architectures: Tuple[str, ...] = ()
+    build_types: Tuple[str, ...] = ()
+    kernel_features: Mapping[str, bool] = field(default_factory=dict)
+    ui_frameworks: Tuple[str, ...] = ("web",)
+    ai_models: Mapping[str, Any] = field(default_factory=dict)
+    optimization_level: str = "O2"
+    debug_symbols: bool = True
+    test_coverage: bool = True
+    build_optimization: Mapping[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_mapping(cls, data: Mapping) -> "BuildConfig":
+        """从解析后的配置构建，缺失字段使用默认值，未识别的字段忽略"""
+        values = {}
+        for config_field in fields(cls):
+            if config_field.name not in data:
+                continue
+            value = data[config_field.name]
+            if isinstance(value, list):
+                value = tuple(value)
+            elif isinstance(value, Mapping):
+                value = dict(value)
+            values[config_field.name] = value
+        return cls(**values)
+
+
+@dataclass(frozen=True, slots=True)
+class Action:
+    """构建图中的一个动作节点"""
+    name: str
+    inputs: Tuple[Path, ...]
+    outputs: Tuple[Path, ...]
+    deps: Tuple[str, ...]
+    run: Callable[[], Union[bool, Awaitable[bool]]]
+    cli_args: Tuple[str, ...] = ()  # 单独执行该动作的命令行参数，供ninja调用
+
+
 class ByenatOSBuilder:
     """ByenatOS构建系统主类"""
     
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, one_shot: bool = True):
         self.project_root = project_root
-        self.build_config = self.load_build_config()
+        # 常用路径只拼接一次
+        self.config_path = project_root / "Build" / "Configuration" / "build_config.json"
+        self.kernel_dir = project_root / "Kernel"
+        self.ai_dir = project_root / "AIServices"
+        self.ui_dir = project_root / "UserInterface"
+        self.output_dir = project_root / "Build" / "Output"
+        self.fingerprint_dir = self.output_dir / ".fingerprints"
+        self.release_dir = project_root / "Build" / "Release"
+        self.release_dir.mkdir(parents=True, exist_ok=True)
+        self.sccache_dir = project_root / "Build" / ".sccache"
+        # (架构, 构建类型) -> 已创建的内核输出目录
+        self._kernel_out_dirs: Dict[Tuple[str, str], Path] = {}
+        
+        self.build_config = BuildConfig.from_mapping(self.load_build_config())
+        # 可读时间戳只用于横幅，耗时统计使用单调时钟(time.monotonic_ns)
         self.build_timestamp = datetime.now().isoformat()
+        # 可用且未在配置中关闭时，用sccache包装rustc以复用编译缓存
+        self.rustc_wrapper = (
+            shutil.which("sccache")
+            if self.build_config.build_optimization.get("ccache_enabled", True)
+            else None
+        )
+        # 一次性构建不计算也不读写输入指纹；监视模式下各构建步骤按上次成功构建时的指纹跳过
+        self.one_shot = one_shot
         
-    def load_build_config(self) -> Dict:
+    def load_build_config(self) -> Mapping:
         """加载构建配置"""
-        config_path = self.project_root / "Build" / "Configuration" / "build_config.json"
-        if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
+        config_path = self.config_path
+        if not config_path.exists():
             return self.get_default_config()
+        
+        # 解析结果按文件mtime和大小缓存，配置未变化时跳过JSON解析
+        stat = config_path.stat()
+        cache_key = f"{stat.st_mtime_ns}-{stat.st_size}"
+        cache_path = config_path.with_name(".build_config.cache.pkl")
+        
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_key, cached_config = pickle.load(f)
+            if cached_key == cache_key:
+                return cached_config
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            pass
+        
+        config = _json_loads(config_path.read_bytes())
+        
+        # 先写临时文件再原子替换，避免并发构建读到半截缓存
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((cache_key, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+        
+        return config
     
-    def get_default_config(self) -> Dict:
-        """获取默认构建配置"""
-        return {
-            "target_architectures": ["x86_64", "arm64"],
-            "build_types": ["debug", "release"],
-            "kernel_features": {
-                "ai_scheduler": True,
-                "smart_memory": True,
-                "secure_boot": True,
-                "power_management": True
-            },
-            "ui_frameworks": ["web", "native"],
-            "ai_models": {
-                "language_model": "7b_chinese",
-                "voice_recognition": "whisper_optimized",
-                "computer_vision": "yolo_lite"
-            },
-            "optimization_level": "O2",
-            "debug_symbols": True,
-            "test_coverage": True
-        }
+    def get_default_config(self) -> Mapping:
+        """获取默认构建配置（只读）"""
+        return _DEFAULT_CONFIG
+    
+    def _check_fingerprint(self, target: str, paths: Iterable[Path], flags: str = "") -> Tuple[bool, Optional[bytes]]:
+        """比较目标当前输入指纹与上次成功构建时记录的指纹，返回(是否一致, 当前指纹)；一次性构建返回(False, None)"""
+        if self.one_shot:
+            return False, None
+        fingerprint = hashlib.blake2b(_fingerprint(paths) + flags.encode(), digest_size=16).digest()
+        stamp_path = self.fingerprint_dir / f"{target}.hash"
+        try:
+            return stamp_path.read_bytes() == fingerprint, fingerprint
+        except FileNotFoundError:
+            return False, fingerprint
+    
+    def _save_fingerprint(self, target: str, fingerprint: Optional[bytes]):
+        """记录目标构建成功时的输入指纹"""
+        if fingerprint is None:
+            return
+        self.fingerprint_dir.mkdir(parents=True, exist_ok=True)
+        (self.fingerprint_dir / f"{target}.hash").write_bytes(fingerprint)
+    
+    async def _run_command(self, cmd: List[str], cwd: Path, env: Optional[Dict[str, str]] = None) -> bool:
+        """异步执行外部命令并逐行转发输出，返回是否成功"""
+        log.debug("  $ %s", " ".join(cmd))
+        process = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        async for line in process.stdout:
+            log.info("    %s", line.decode(errors='replace').rstrip())
+        return await process.wait() == 0
     
-    def build_kernel(self, architecture: str, build_type: str) -> bool:
+    def _kernel_out(self, architecture: str, build_type: str) -> Path:
+        """内核输出目录，每个组合只创建一次"""
+        key = (architecture, build_type)
+        build_dir = self._kernel_out_dirs.get(key)
+        if build_dir is None:
+            build_dir = self.output_dir / f"kernel_{architecture}_{build_type}"
+            build_dir.mkdir(parents=True, exist_ok=True)
+            self._kernel_out_dirs[key] = build_dir
+        return build_dir
+    
+    def _cargo_env(self, architecture: str, build_type: str) -> Dict[str, str]:
+        """cargo子进程环境变量"""
+        env = dict(os.environ)
+        # 每个架构/构建类型组合使用独立的target目录，并行构建时不争用cargo的目录锁
+        if self.build_config.build_optimization.get("isolated_target_dirs", True):
+            env["CARGO_TARGET_DIR"] = str(self.output_dir / f"target-{architecture}-{build_type}")
+        if self.rustc_wrapper:
+            env["RUSTC_WRAPPER"] = self.rustc_wrapper
+            # 增量编译产物无法被sccache缓存，启用sccache时需关闭
+            env["CARGO_INCREMENTAL"] = "0"
+            # 缓存目录放在target之外，清理构建产物时保留
+            env.setdefault("SCCACHE_DIR", str(self.sccache_dir))
+        return env
+    
+    async def build_kernel(self, architecture: str, build_type: str) -> bool:
         """构建内核"""
-        print(f"🔧 构建内核 [{architecture}] [{build_type}]")
+        log.info("🔧 构建内核 [%s] [%s]", architecture, build_type)
         
-        kernel_path = self.project_root / "Kernel"
-        build_dir = self.project_root / "Build" / "Output" / f"kernel_{architecture}_{build_type}"
-        build_dir.mkdir(parents=True, exist_ok=True)
+        target = f"kernel_{architecture}_{build_type}"
+        up_to_date, fingerprint = self._check_fingerprint(
+            target, (self.kernel_dir, self.config_path), f"{architecture}:{build_type}"
+        )
+        if up_to_date:
+            log.info("  缓存命中，跳过内核构建")
+            return True
         
-        # 这里将来会调用实际的Rust编译器构建内核
-        commands = [
-            f"# 内核构建命令 (占位符)",
-            f"# cargo build --target {architecture} --{'release' if build_type == 'release' else 'debug'}",
-            f"# 输出到: {build_dir}"
-        ]
+        build_dir = self._kernel_out(architecture, build_type)
         
-        for cmd in commands:
-            print(f"  {cmd}")
+        manifest_path = self.kernel_dir / "Cargo.toml"
+        if manifest_path.exists():
+            cmd = ["cargo", "build", "--manifest-path", str(manifest_path), "--target", architecture]
+            if build_type == "release":
+                cmd.append("--release")
+            if not await self._run_command(cmd, cwd=self.kernel_dir, env=self._cargo_env(architecture, build_type)):
+                return False
+        else:
+            # 内核尚未迁移到Cargo工程，输出占位命令
+            commands = [
+                f"# 内核构建命令 (占位符)",
+                f"# cargo build --target {architecture} --{'release' if build_type == 'release' else 'debug'}",
+                f"# 输出到: {build_dir}"
+            ]
+            
+            for cmd in commands:
+                log.info("  %s", cmd)
         
+        self._save_fingerprint(target, fingerprint)
         return True
     
-    def build_ai_services(self) -> bool:
+    async def build_kernels(self, architectures: List[str], build_types: List[str]) -> bool:
+        """并发构建所有架构和构建类型组合的内核"""
+        results = await asyncio.gather(*(
+            self.build_kernel(arch, build_type)
+            for arch in architectures
+            for build_type in build_types
+        ))
+        return all(results)
+    
+    async def build_ai_services(self) -> bool:
         """构建AI服务"""
-        print("🤖 构建AI服务")
+        log.info("🤖 构建AI服务")
         
-        ai_services_path = self.project_root / "AIServices"
-        models_config = self.build_config.get("ai_models", {})
+        up_to_date, fingerprint = self._check_fingerprint("ai_services", (self.ai_dir, self.config_path))
+        if up_to_date:
+            log.info("  缓存命中，跳过AI服务构建")
+            return True
         
-        services = [
-            "NaturalLanguage",
-            "ComputerVision", 
-            "PersonalAssistant",
-            "SmartAutomation",
-            "LearningEngine"
-        ]
+        models_config = self.build_config.ai_models
         
-        for service in services:
-            print(f"  构建 {service} 服务")
+        _log = log.info
+        for service in _AI_SERVICES:
+            _log("  构建 %s 服务", service)
             # 这里将来会实际构建AI服务
         
+        self._save_fingerprint("ai_services", fingerprint)
         return True
     
-    def build_user_interface(self) -> bool:
+    async def build_user_interface(self) -> bool:
         """构建用户界面"""
-        print("🎨 构建用户界面")
+        log.info("🎨 构建用户界面")
+        
+        up_to_date, fingerprint = self._check_fingerprint("user_interface", (self.ui_dir, self.config_path))
+        if up_to_date:
+            log.info("  缓存命中，跳过用户界面构建")
+            return True
         
-        ui_path = self.project_root / "UserInterface"
-        frameworks = self.build_config.get("ui_frameworks", ["web"])
+        frameworks = self.build_config.ui_frameworks
         
         for framework in frameworks:
-            print(f"  构建 {framework} 界面")
+            log.info("  构建 %s 界面", framework)
             if framework == "web":
                 # 构建Web界面
-                print("    - 编译TypeScript")
-                print("    - 处理CSS/SCSS")
-                print("    - 优化资源文件")
+                log.info("    - 编译TypeScript")
+                log.info("    - 处理CSS/SCSS")
+                log.info("    - 优化资源文件")
             elif framework == "native":
                 # 构建原生界面
-                print("    - 编译原生组件")
-                print("    - 生成界面资源")
+                log.info("    - 编译原生组件")
+                log.info("    - 生成界面资源")
         
+        self._save_fingerprint("user_interface", fingerprint)
         return True
     
     def run_tests(self) -> bool:
         """运行测试套件"""
-        print("🧪 运行测试")
-        
-        test_types = [
-            "UnitTests",
-            "IntegrationTests", 
-            "PerformanceTests",
-            "SecurityTests",
-            "AITests"
-        ]
+        log.info("🧪 运行测试")
+        
+        tests_dir = self.project_root / "Tests"
+        parallel_paths = []
+        serial_paths = []
+        _log = log.info
+        for test_type in _TEST_TYPES:
+            test_path = tests_dir / test_type
+            if not test_path.is_dir():
+                _log("  跳过 %s (目录不存在)", test_type)
+                continue
+            _log("  运行 %s", test_type)
+            # 性能测试需要独占CPU核心，不参与并行分发
+            if test_type == "PerformanceTests":
+                serial_paths.append(str(test_path))
+            else:
+                parallel_paths.append(str(test_path))
         
-        for test_type in test_types:
-            print(f"  运行 {test_type}")
-            # 这里将来会实际运行测试
+        pytest = [sys.executable, "-m", "pytest"]
+        if parallel_paths:
+            # 按文件分发到各核心，同一文件留在同一worker以复用导入缓存
+            if importlib.util.find_spec("xdist") is not None:
+                cmd = pytest + ["-n", "auto", "--dist=loadfile", *parallel_paths]
+            else:
+                log.warning("  未安装pytest-xdist，测试将串行运行")
+                cmd = pytest + parallel_paths
+            if subprocess.run(cmd, cwd=self.project_root).returncode != 0:
+                return False
+        if serial_paths:
+            cmd = pytest + ["-p", "no:xdist", *serial_paths]
+            if subprocess.run(cmd, cwd=self.project_root).returncode != 0:
+                return False
         
         return True
     
     def package_system(self) -> bool:
         """打包操作系统"""
-        print("📦 打包操作系统")
-        
-        package_dir = self.project_root / "Build" / "Release"
-        package_dir.mkdir(parents=True, exist_ok=True)
+        log.info("📦 打包操作系统")
         
         # 创建ISO镜像或其他分发格式
-        print("  创建系统镜像")
-        print("  生成安装程序")
-        print("  创建更新包")
+        log.info("  创建系统镜像")
+        log.info("  生成安装程序")
+        log.info("  创建更新包")
         
         return True
     
-    def build_all(self, architectures: List[str], build_types: List[str]) -> bool:
+    async def build_all(self, architectures: List[str], build_types: List[str]) -> bool:
         """执行完整构建流程"""
-        print(f"🚀 开始构建 ByenatOS")
-        print(f"构建时间: {self.build_timestamp}")
-        print(f"目标架构: {architectures}")
-        print(f"构建类型: {build_types}")
-        print()
+        self._print_banner(architectures, build_types)
+        started = time.monotonic_ns()
         
         try:
-            # 构建内核
-            for arch in architectures:
-                for build_type in build_types:
-                    if not self.build_kernel(arch, build_type):
-                        return False
+            graph = self.build_graph(architectures, build_types)
+            order = self._topological_order(graph)
             
-            # 构建AI服务
-            if not self.build_ai_services():
+            if not await self.run_build_graph(graph, order):
                 return False
             
-            # 构建用户界面
-            if not self.build_user_interface():
+            log.info("✅ 构建完成! 总用时 %.2fs", (time.monotonic_ns() - started) / 1e9)
+            return True
+            
+        except Exception as e:
+            log.error("❌ 构建失败: %s", e)
+            return False
+    
+    def _print_banner(self, architectures: List[str], build_types: List[str]):
+        """输出构建信息"""
+        log.info("🚀 开始构建 ByenatOS")
+        log.info("构建时间: %s", self.build_timestamp)
+        log.info("目标架构: %s", architectures)
+        log.info("构建类型: %s", build_types)
+        log.info("")
+    
+    def build_graph(self, architectures: List[str], build_types: List[str]) -> Dict[str, Action]:
+        """构建动作图: 内核、AI服务、用户界面互相独立，测试和打包依赖所有编译动作"""
+        graph = self._kernel_actions(architectures, build_types)
+        graph.update(self._component_actions())
+        
+        final_deps = tuple(graph)
+        test_action = self._maybe_test_action(final_deps)
+        if test_action:
+            graph[test_action.name] = test_action
+            final_deps = (test_action.name,)
+        
+        package_action = self._package_action(final_deps)
+        graph[package_action.name] = package_action
+        return graph
+    
+    def _kernel_actions(self, architectures: List[str], build_types: List[str]) -> Dict[str, Action]:
+        """每个架构和构建类型组合对应一个独立的内核构建动作"""
+        actions = {}
+        for arch in architectures:
+            for build_type in build_types:
+                name = f"kernel_{arch}_{build_type}"
+                actions[name] = Action(
+                    name=name,
+                    inputs=(self.kernel_dir, self.config_path),
+                    outputs=(self.output_dir / name,),
+                    deps=(),
+                    run=partial(self.build_kernel, arch, build_type),
+                    cli_args=("--kernel-only", "--arch", arch, "--type", build_type)
+                )
+        return actions
+    
+    def _component_actions(self) -> Dict[str, Action]:
+        """AI服务和用户界面构建动作"""
+        return {
+            "ai_services": Action(
+                name="ai_services",
+                inputs=(self.ai_dir, self.config_path),
+                outputs=(),
+                deps=(),
+                run=self.build_ai_services,
+                cli_args=("--ai-only",)
+            ),
+            "user_interface": Action(
+                name="user_interface",
+                inputs=(self.ui_dir, self.config_path),
+                outputs=(),
+                deps=(),
+                run=self.build_user_interface,
+                cli_args=("--ui-only",)
+            ),
+        }
+    
+    def _maybe_test_action(self, deps: Tuple[str, ...]) -> Optional[Action]:
+        """启用测试覆盖时返回测试动作"""
+        if not self.build_config.test_coverage:
+            return None
+        return Action(name="tests", inputs=(), outputs=(), deps=deps, run=self.run_tests, cli_args=("--test",))
+    
+    def _package_action(self, deps: Tuple[str, ...]) -> Action:
+        """打包动作，在所有前置动作完成后执行"""
+        return Action(
+            name="package",
+            inputs=(),
+            outputs=(self.release_dir,),
+            deps=deps,
+            run=self.package_system,
+            cli_args=("--package",)
+        )
+    
+    def _topological_order(self, graph: Dict[str, Action]) -> List[str]:
+        """按依赖关系对动作拓扑排序，存在缺失依赖或循环依赖时抛出ValueError"""
+        remaining = {name: set(action.deps) for name, action in graph.items()}
+        missing = {dep for deps in remaining.values() for dep in deps} - set(graph)
+        if missing:
+            raise ValueError(f"构建图引用了不存在的动作: {sorted(missing)}")
+        
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"构建图存在循环依赖: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+                for deps in remaining.values():
+                    deps.discard(name)
+            order.extend(ready)
+        return order
+    
+    async def run_build_graph(self, graph: Dict[str, Action], order: Optional[List[str]] = None) -> bool:
+        """按依赖关系并发执行动作，依赖完成即启动，任一动作失败立即停止"""
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        async def run_action(action: Action) -> bool:
+            if action.deps and not all(await asyncio.gather(*(tasks[dep] for dep in action.deps))):
                 return False
             
-            # 运行测试
-            if self.build_config.get("test_coverage", True):
-                if not self.run_tests():
-                    return False
+            started = time.monotonic_ns()
+            if inspect.iscoroutinefunction(action.run):
+                success = await action.run()
+            else:
+                # 同步步骤放到线程中执行，避免阻塞其他动作
+                success = await asyncio.to_thread(action.run)
+            elapsed_ns = time.monotonic_ns() - started
             
-            # 打包系统
-            if not self.package_system():
+            if not success:
+                log.error("❌ 构建任务失败: %s (%.2fs)", action.name, elapsed_ns / 1e9)
                 return False
             
-            print("✅ 构建完成!")
+            log.info("  %s 完成，用时 %.2fs", action.name, elapsed_ns / 1e9)
+            return True
+        
+        for name in order or self._topological_order(graph):
+            tasks[name] = asyncio.create_task(run_action(graph[name]))
+        
+        try:
+            for future in asyncio.as_completed(list(tasks.values())):
+                if not await future:
+                    return False
             return True
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+    
+    def emit_ninja(self, graph: Dict[str, Action], out: Path) -> Path:
+        """把动作图写成ninja构建文件：每个动作一条构建边，以stamp文件为产物，由ninja负责增量判断和并行调度"""
+        def escape(value: str) -> str:
+            return value.replace("$", "$$").replace(" ", "$ ").replace(":", "$:")
+        
+        stamp_dir = self.output_dir / ".stamps"
+        script = Path(__file__).resolve()
+        lines = [
+            "# 由 Build/Scripts/BuildSystem.py 生成，请勿手动修改",
+            f"python = {escape(sys.executable)}",
+            f"script = {escape(str(script))}",
+            # .ninja_log/.ninja_deps写到输出目录，不留在运行ninja的项目根目录
+            f"builddir = {escape(str(self.output_dir))}",
+            "",
+            "rule step",
+            "  command = $python $script $args && touch $out",
+            "  description = $name",
+            "",
+        ]
+        
+        for name in self._topological_order(graph):
+            action = graph[name]
+            input_files = []
+            for path in action.inputs:
+                if path.is_dir():
+                    input_files.extend(
+                        os.path.join(root, file)
+                        for root, dirs, files in os.walk(path)
+                        if "__pycache__" not in root
+                        for file in files
+                    )
+                elif path.exists():
+                    input_files.append(str(path))
             
-        except Exception as e:
-            print(f"❌ 构建失败: {e}")
+            explicit = " ".join(escape(f) for f in sorted(input_files))
+            implicit = " ".join(escape(str(stamp_dir / f"{dep}.stamp")) for dep in action.deps)
+            edge = f"build {escape(str(stamp_dir / f'{name}.stamp'))}: step {explicit}"
+            if implicit:
+                edge += f" | {implicit}"
+            lines.append(edge)
+            lines.append(f"  name = {name}")
+            lines.append(f"  args = {' '.join(escape(arg) for arg in action.cli_args)}")
+            lines.append("")
+        
+        stamp_dir.mkdir(parents=True, exist_ok=True)
+        out.write_text("\n".join(lines), encoding="utf-8")
+        return out
+    
+    async def build_with_ninja(self, architectures: List[str], build_types: List[str]) -> bool:
+        """生成build.ninja并交给ninja执行；未安装ninja时回退到内置调度"""
+        ninja = shutil.which("ninja")
+        if ninja is None:
+            log.warning("未找到ninja，使用内置调度器构建")
+            return await self.build_all(architectures, build_types)
+        
+        self._print_banner(architectures, build_types)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        ninja_file = self.emit_ninja(self.build_graph(architectures, build_types),
+                                     self.output_dir / "build.ninja")
+        cmd = [ninja, "-f", str(ninja_file), "-j", str(os.cpu_count() or 1)]
+        if not await self._run_command(cmd, cwd=self.project_root):
+            log.error("❌ 构建失败: ninja 返回错误")
+            return False
+        
+        log.info("✅ 构建完成!")
+        return True
+    
+    async def watch(self, architectures: List[str], build_types: List[str], interval: float = 1.0) -> bool:
+        """监视源码和配置变化，持续执行增量构建（Ctrl+C退出）"""
+        watched = [self.kernel_dir, self.ai_dir, self.ui_dir, self.config_path]
+        last_fingerprint = None
+        
+        try:
+            while True:
+                current = _fingerprint(watched)
+                if current != last_fingerprint:
+                    self.build_config = BuildConfig.from_mapping(self.load_build_config())
+                    await self.build_all(architectures, build_types)
+                    last_fingerprint = current
+                    log.info("👀 监视中... (Ctrl+C退出)")
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            return True
+
+# 单步构建选项: (命令行参数名, 执行函数)，可组合使用，按声明顺序依次执行
+_STEP_DISPATCH = (
+    ("kernel_only", lambda builder, args: builder.build_kernels(args.arch, args.type)),
+    ("ai_only", lambda builder, args: builder.build_ai_services()),
+    ("ui_only", lambda builder, args: builder.build_user_interface()),
+    ("test", lambda builder, args: builder.run_tests()),
+    ("package", lambda builder, args: builder.package_system()),
+)
+
+
+async def _run_steps(builder: ByenatOSBuilder, args, steps) -> bool:
+    """依次执行选中的单步构建，任一步骤失败立即停止"""
+    for step in steps:
+        result = step(builder, args)
+        if inspect.isawaitable(result):
+            result = await result
+        if not result:
             return False
+    return True
 
-def main():
-    """主函数"""
+def setup_logging(verbose: bool = False) -> logging.handlers.QueueListener:
+    """配置构建日志：格式化和输出交给后台线程，调用方退出前需调用listener.stop()"""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, logging.StreamHandler(sys.stdout), respect_handler_level=True
+    )
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(logging.DEBUG if verbose else logging.INFO)
+    log.propagate = False
+    listener.start()
+    return listener
+
+def _parse_args(argv: List[str]):
+    """解析命令行参数；argparse只在命令行入口导入，作为模块导入时不承担其开销"""
+    import argparse
+    
     parser = argparse.ArgumentParser(description="ByenatOS 构建系统")
     parser.add_argument("--arch", nargs="+", default=["x86_64"], 
                        help="目标架构 (x86_64, arm64)")
@@ -205,29 +687,42 @@ def main():
                        help="运行测试")
     parser.add_argument("--package", action="store_true",
                        help="打包系统")
+    parser.add_argument("--watch", action="store_true",
+                       help="监视源码变化并持续增量构建")
+    parser.add_argument("--ninja", action="store_true",
+                       help="生成build.ninja并由ninja调度构建")
+    parser.add_argument("--verbose", action="store_true",
+                       help="输出调试日志")
     
-    args = parser.parse_args()
+    return parser.parse_args(argv)
+
+def main():
+    """主函数"""
+    args = _parse_args(sys.argv[1:])
+    listener = setup_logging(args.verbose)
     
     # 确定项目根目录
     project_root = Path(__file__).parent.parent.parent
-    builder = ByenatOSBuilder(project_root)
+    builder = ByenatOSBuilder(project_root, one_shot=not args.watch)
     
     success = True
     
-    if args.kernel_only:
-        for arch in args.arch:
-            for build_type in args.type:
-                success &= builder.build_kernel(arch, build_type)
-    elif args.ai_only:
-        success = builder.build_ai_services()
-    elif args.ui_only:
-        success = builder.build_user_interface()
-    elif args.test:
-        success = builder.run_tests()
-    elif args.package:
-        success = builder.package_system()
-    else:
-        success = builder.build_all(args.arch, args.type)
+    try:
+        selected = [step for flag, step in _STEP_DISPATCH if getattr(args, flag)]
+        if selected:
+            success = asyncio.run(_run_steps(builder, args, selected))
+        elif args.watch:
+            try:
+                success = asyncio.run(builder.watch(args.arch, args.type))
+            except KeyboardInterrupt:
+                success = True
+        elif args.ninja:
+            success = asyncio.run(builder.build_with_ninja(args.arch, args.type))
+        else:
+            success = asyncio.run(builder.build_all(args.arch, args.type))
+    finally:
+        # 退出前刷新队列中剩余的日志
+        listener.stop()
     
     sys.exit(0 if success else 1)
 
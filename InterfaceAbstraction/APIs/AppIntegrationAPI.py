@@ -6,28 +6,135 @@ App集成API - 提供标准化的App与系统集成接口
 """
 
 import asyncio
+import base64
+import hmac
 import json
+import logging
+import os
 import time
 import uuid
 import hashlib
-import jwt
-from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any, Set
-from dataclasses import dataclass, asdict
+import re
+import secrets
+import struct
+from datetime import datetime, timezone
+from typing import Annotated, Callable, Dict, FrozenSet, List, Optional, Any, Set, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
+from operator import itemgetter
 
-from fastapi import FastAPI, HTTPException, Depends, Security, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from pydantic import BaseModel, Field, validator
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import aioredis
+import ahocorasick
 import asyncpg
+import msgspec
+import numpy as np
+import orjson
+from cachetools import LRUCache, TTLCache
 
 # 导入内部组件
 from Kernel.Core.HiNATAProcessor import HiNATAProcessor
 from Kernel.Core.PSPEngine import PSPEngine  
-from Kernel.Core.StorageEngine import StorageEngine
+from Kernel.Core.StorageEngine import StorageEngine, RetrievalQuery
+
+
+# 最近一次格式化的整秒及其"%Y-%m-%dT%H:%M:%S"文本，同一秒内的时间戳复用
+_iso_second: List[Any] = [None, ""]
+
+
+def utc_now_iso() -> str:
+    """当前UTC时间的ISO 8601文本（微秒精度），不构造datetime对象；各API模块共用"""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    if seconds != _iso_second[0]:
+        _iso_second[1] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _iso_second[0] = seconds
+    return f"{_iso_second[1]}.{nanos // 1000:06d}+00:00"
+
+
+def worker_pool_limits(config: Dict[str, Any]) -> Tuple[int, int]:
+    """按服务的数据库连接预算和worker数计算每个worker的连接池(min_size, max_size)。
+    预算默认40，为Postgres默认的100个连接给其他服务和处理器/存储引擎的连接池留出余量"""
+    workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    max_size = config.get('db_pool_max_size') or max(2, config.get('db_connection_budget', 40) // workers)
+    min_size = min(config.get('db_pool_min_size', 2), max_size)
+    return min_size, max_size
+
+
+# 检索结果对外暴露的元数据字段，存储引擎构建结果时总会填充这些字段
+SEARCH_METADATA_FIELDS = ('source', 'timestamp', 'quality_score')
+_search_metadata = itemgetter(*SEARCH_METADATA_FIELDS)
+
+
+# 问题检索结果的元数据字段及缺省值
+_HINATA_META_KEYS = (('source', ''), ('timestamp', ''), ('attention_weight', 0), ('quality_score', 0))
+
+
+def _format_hinata(result, include_metadata: bool) -> Dict[str, Any]:
+    """格式化问题检索结果"""
+    hinata_item = {
+        'hinata_id': result.hinata_id,
+        'content_summary': result.content_summary,
+        'relevance_score': result.relevance_score,
+    }
+    if include_metadata:
+        metadata_get = result.metadata.get
+        hinata_item['metadata'] = {key: metadata_get(key, default) for key, default in _HINATA_META_KEYS}
+    return hinata_item
+
+
+def _format_knowledge(result) -> Dict[str, Any]:
+    """格式化HiNATA知识组件"""
+    metadata_get = result.metadata.get
+    return {
+        'content_summary': result.content_summary,
+        'relevance_score': result.relevance_score,
+        'source': metadata_get('source', ''),
+        'timestamp': metadata_get('timestamp', ''),
+        'component_type': 'knowledge'  # 明确标识为知识组件
+    }
+
+
+def _knowledge_columns(results) -> Dict[str, Any]:
+    """按列格式化HiNATA知识组件：每个字段一个列表，避免为每条结果构建字典"""
+    metadata = [result.metadata for result in results]
+    return {
+        'content_summary': [result.content_summary for result in results],
+        'relevance_score': [result.relevance_score for result in results],
+        'source': [meta.get('source', '') for meta in metadata],
+        'timestamp': [meta.get('timestamp', '') for meta in metadata],
+        'component_type': 'knowledge'
+    }
+
+
+# HiNATA批次分块大小与同时处理的块数
+HINATA_CHUNK_SIZE = 10
+HINATA_CHUNK_CONCURRENCY = 8
+
+# App ID哈希输入的固定前缀：时间戳(u64) + 随机UUID(16字节)
+_APP_ID_SEED = struct.Struct("<Q16s")
+
+# 个性化系统提示词的固定首尾，模块加载时确定
+_PROMPT_HEAD = "You are an AI assistant that provides personalized responses."
+_PROMPT_TAIL = (
+    " Use the provided knowledge context to give accurate answers."
+    " Combine your knowledge with the user's personalization preferences."
+)
+_FALLBACK_PROMPT = "You are a helpful AI assistant. Use the provided context to answer questions accurately."
+
+
+def _b64url_encode(data: bytes) -> bytes:
+    """JWT使用的无填充base64url编码"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64url_decode(data: bytes) -> bytes:
+    """补齐填充后解码base64url"""
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
 
 
 class AppPermission(Enum):
@@ -42,6 +149,12 @@ class AppPermission(Enum):
     ADMIN = "admin"
 
 
+# 每个权限对应一个二进制位，请求路径上的权限检查只需一次按位与
+_PERMISSION_BITS: Dict[AppPermission, int] = {
+    permission: 1 << index for index, permission in enumerate(AppPermission)
+}
+
+
 @dataclass
 class AppRegistration:
     """App注册信息"""
@@ -57,44 +170,56 @@ class AppRegistration:
     created_at: str = ""
     last_active: str = ""
     is_active: bool = True
+    # 由permissions派生的权限位掩码及权限值集合，不参与构造和缓存
+    permission_mask: int = field(default=0, init=False, repr=False)
+    permission_values: FrozenSet[str] = field(default=frozenset(), init=False, repr=False)
+    
+    def __post_init__(self):
+        mask = 0
+        for permission in self.permissions:
+            mask |= _PERMISSION_BITS[permission]
+        self.permission_mask = mask
+        self.permission_values = frozenset(permission.value for permission in self.permissions)
+    
+    def has_permission(self, permission: AppPermission) -> bool:
+        """检查App是否拥有指定权限"""
+        return bool(self.permission_mask & _PERMISSION_BITS[permission])
 
 
-# Pydantic模型定义
-class HiNATASubmissionModel(BaseModel):
-    """HiNATA提交模型"""
-    id: str = Field(..., description="HiNATA唯一标识符")
-    timestamp: str = Field(..., description="创建时间戳 (ISO 8601)")
-    source: str = Field(..., description="数据源标识")
-    highlight: str = Field(..., max_length=10000, description="高亮文本")
-    note: str = Field(..., max_length=50000, description="用户笔记")
-    address: str = Field(..., description="资源地址")
-    tag: List[str] = Field(default=[], description="用户标签")
-    access: str = Field(..., regex="^(private|public|shared)$", description="访问级别")
-    raw_data: Dict[str, Any] = Field(default={}, description="原始数据")
+# HiNATA提交热路径使用msgspec直接从请求体解码，批量校验不经过逐字段的Python验证器
+class HiNATASubmission(msgspec.Struct, frozen=True):
+    """HiNATA提交结构"""
+    id: str  # HiNATA唯一标识符
+    timestamp: str  # 创建时间戳 (ISO 8601)
+    source: str  # 数据源标识
+    highlight: Annotated[str, msgspec.Meta(max_length=10000)]  # 高亮文本
+    note: Annotated[str, msgspec.Meta(max_length=50000)]  # 用户笔记
+    address: str  # 资源地址
+    access: Annotated[str, msgspec.Meta(pattern="^(private|public|shared)$")]  # 访问级别
+    tag: List[str] = []  # 用户标签
+    raw_data: Dict[str, Any] = {}  # 原始数据
     
-    @validator('timestamp')
-    def validate_timestamp(cls, v):
+    def __post_init__(self):
         try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
-            return v
+            datetime.fromisoformat(self.timestamp.replace('Z', '+00:00'))
         except ValueError:
             raise ValueError('Invalid timestamp format')
 
 
-class HiNATABatchSubmissionModel(BaseModel):
-    """HiNATA批量提交模型"""
-    app_id: str = Field(..., description="App标识符")
-    user_id: str = Field(..., description="用户标识符")
-    hinata_batch: List[HiNATASubmissionModel] = Field(..., description="HiNATA数据批次")
-    processing_options: Dict[str, Any] = Field(default={}, description="处理选项")
-    
-    @validator('hinata_batch')
-    def validate_batch_size(cls, v):
-        if len(v) > 100:
-            raise ValueError('Batch size cannot exceed 100')
-        return v
+class HiNATABatchSubmission(msgspec.Struct, frozen=True):
+    """HiNATA批量提交结构"""
+    app_id: str  # App标识符
+    user_id: str  # 用户标识符
+    hinata_batch: Annotated[List[HiNATASubmission], msgspec.Meta(max_length=100)]  # HiNATA数据批次
+    processing_options: Dict[str, Any] = {}  # 处理选项
+
 
+class _RequestScope(msgspec.Struct):
+    """预检只需要请求体中的user_id，其余字段解码时跳过"""
+    user_id: Optional[str] = None
 
+
+# Pydantic模型定义
 class PSPContextRequestModel(BaseModel):
     """PSP上下文请求模型"""
     user_id: str = Field(..., description="用户标识符")
@@ -119,7 +244,7 @@ class RetrievalQueryModel(BaseModel):
     query_text: Optional[str] = Field(None, description="查询文本")
     semantic_vector: Optional[List[float]] = Field(None, description="语义向量")
     filters: Dict[str, Any] = Field(default={}, description="过滤条件")
-    limit: int = Field(default=10, max=50, description="返回结果数量限制")
+    limit: int = Field(default=10, le=50, description="返回结果数量限制")
     min_relevance_score: float = Field(default=0.5, description="最小相关性分数")
 
 
@@ -127,7 +252,7 @@ class HiNATAQueryModel(BaseModel):
     """HiNATA问题查询模型"""
     user_id: str = Field(..., description="用户标识符")
     question: str = Field(..., max_length=2000, description="用户问题")
-    limit: int = Field(default=10, max=20, description="返回结果数量限制")
+    limit: int = Field(default=10, le=20, description="返回结果数量限制")
     min_relevance_score: float = Field(default=0.5, description="最小相关性分数")
     include_metadata: bool = Field(default=True, description="是否包含元数据")
 
@@ -136,8 +261,9 @@ class PersonalizedEnhancementModel(BaseModel):
     """个性化增强请求模型"""
     user_id: str = Field(..., description="用户标识符")
     question: str = Field(..., max_length=2000, description="用户问题")
-    context_limit: int = Field(default=5, max=10, description="HiNATA上下文数量限制")
+    context_limit: int = Field(default=5, le=10, description="HiNATA上下文数量限制")
     include_psp_details: bool = Field(default=False, description="是否包含PSP详细信息")
+    knowledge_layout: str = Field(default="rows", pattern="^(rows|columns)$", description="知识组件布局：rows为逐条字典，columns为按字段分列")
 
 
 # 响应模型
@@ -189,6 +315,7 @@ class PersonalizedEnhancementResponse(BaseModel):
     question: str
     personalized_prompt: str  # PSP个性化组件（融入系统提示词）
     knowledge_components: List[Dict[str, Any]]  # HiNATA知识组件
+    knowledge_columns: Optional[Dict[str, Any]] = None  # 按列布局的HiNATA知识组件（knowledge_layout=columns时）
     psp_summary: Dict[str, Any]  # PSP摘要信息
     processing_time: float
 
@@ -196,58 +323,122 @@ class PersonalizedEnhancementResponse(BaseModel):
 class RateLimiter:
     """API速率限制器"""
     
+    # INCR与首次计数时的EXPIRE在一个脚本内原子执行，返回当前计数
+    RATE_LIMIT_SCRIPT = (
+        "local c=redis.call('INCR',KEYS[1]); "
+        "if c==1 then redis.call('EXPIRE',KEYS[1],ARGV[1]) end; "
+        "return c"
+    )
+    WINDOW_SECONDS = 3600
+    
     def __init__(self, redis_pool):
         self.redis_pool = redis_pool
+        self.script = redis_pool.register_script(self.RATE_LIMIT_SCRIPT)
+        # 当前窗口编号由后台任务每秒刷新，请求路径上不再读取时钟
+        self._hour_bucket = int(time.time() // self.WINDOW_SECONDS)
+    
+    async def tick(self, interval: float = 1.0):
+        """定期刷新当前窗口编号"""
+        while True:
+            await asyncio.sleep(interval)
+            self._hour_bucket = int(time.time() // self.WINDOW_SECONDS)
+    
+    def _hour_key(self, app_id: str, user_id: str) -> str:
+        """当前小时窗口的计数键"""
+        return f"rate_limit:{app_id}:{user_id}:{self._hour_bucket}"
+    
+    async def hit(self, app_id: str, user_id: str) -> int:
+        """计数一次请求，返回当前小时窗口内的请求数"""
+        hour_key = self._hour_key(app_id, user_id)
+        return int(await self.script(keys=[hour_key], args=[self.WINDOW_SECONDS]))
     
     async def check_rate_limit(self, app_id: str, user_id: str, limit: int = 1000) -> bool:
         """检查速率限制"""
-        key = f"rate_limit:{app_id}:{user_id}"
-        current_hour = int(time.time() // 3600)
-        hour_key = f"{key}:{current_hour}"
-        
-        current_count = await self.redis_pool.get(hour_key)
-        if current_count is None:
-            await self.redis_pool.setex(hour_key, 3600, 1)
-            return True
-        
-        current_count = int(current_count)
-        if current_count >= limit:
-            return False
-        
-        await self.redis_pool.incr(hour_key)
-        return True
+        return await self.hit(app_id, user_id) <= limit
     
     async def get_remaining_quota(self, app_id: str, user_id: str, limit: int = 1000) -> int:
         """获取剩余配额"""
-        key = f"rate_limit:{app_id}:{user_id}"
-        current_hour = int(time.time() // 3600)
-        hour_key = f"{key}:{current_hour}"
-        
-        current_count = await self.redis_pool.get(hour_key)
+        current_count = await self.redis_pool.get(self._hour_key(app_id, user_id))
         if current_count is None:
             return limit
         
         return max(0, limit - int(current_count))
 
 
+class APIConnection(asyncpg.Connection):
+    """API数据库连接，认证查询在每个连接上只准备一次"""
+    __slots__ = ('_auth_stmt',)
+    
+    AUTH_SQL = '''
+        SELECT app_id, app_name, app_version, developer, description, permissions::text AS permissions,
+               api_key, webhook_url, rate_limit, created_at, last_active, is_active
+        FROM app_registrations WHERE api_key = $1 AND is_active = TRUE
+    '''
+    
+    async def auth_statement(self):
+        """认证查询的预编译语句，首次使用时准备：建池时app_registrations表可能尚未创建"""
+        try:
+            return self._auth_stmt
+        except AttributeError:
+            self._auth_stmt = await self.prepare(self.AUTH_SQL)
+            return self._auth_stmt
+
+
 class AuthManager:
     """认证管理器"""
     
+    INSERT_REGISTRATION_SQL = '''
+        INSERT INTO app_registrations 
+        (app_id, app_name, app_version, developer, description, permissions,
+         api_key, webhook_url, rate_limit, created_at, is_active)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+    '''
+    
     def __init__(self, db_pool, redis_pool):
         self.db_pool = db_pool
         self.redis_pool = redis_pool
+        # 进程内认证缓存，稳定流量下绝大多数请求无需访问Redis。
+        # 目前没有修改已注册App的接口；日后直接改表（如停用App）时，
+        # 变更最长要经过本地缓存(60秒)加Redis缓存(1小时)才对所有worker生效
+        self._local_auth = TTLCache(maxsize=1024, ttl=60)
+        # app_id -> 最近活跃时间，由后台任务定期批量写回数据库
+        self._last_active: Dict[str, float] = {}
         self.jwt_secret = "byenatos_jwt_secret_key"  # 应该从配置文件读取
         self.jwt_algorithm = "HS256"
+        # HS256 token直接用HMAC签名：固定头部只编码一次，已载入密钥的HMAC状态每次复制使用
+        self._jwt_header_b64 = _b64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+        self._jwt_hmac = hmac.new(self.jwt_secret.encode(), digestmod=hashlib.sha256)
     
     async def register_app(self, registration_data: AppRegistrationModel) -> AppRegistration:
         """注册新App"""
+        app_registration = self._build_registration(registration_data)
+        
+        # 保存到数据库
+        await self._save_app_registration(app_registration)
+        
+        return app_registration
+    
+    async def bulk_register_apps(self, registrations: List[AppRegistrationModel]) -> List[AppRegistration]:
+        """批量注册App（管理接口），一次executemany写入全部注册信息"""
+        app_registrations = [self._build_registration(r) for r in registrations]
+        
+        async with self.db_pool.acquire() as conn:
+            await conn.executemany(
+                self.INSERT_REGISTRATION_SQL,
+                [self._registration_record(r) for r in app_registrations]
+            )
+        
+        return app_registrations
+    
+    def _build_registration(self, registration_data: AppRegistrationModel) -> AppRegistration:
+        """根据注册请求生成App注册信息"""
         app_id = self._generate_app_id(registration_data.app_name)
         api_key = self._generate_api_key()
         
         # 验证和授予权限
         granted_permissions = self._validate_permissions(registration_data.requested_permissions)
         
-        app_registration = AppRegistration(
+        return AppRegistration(
             app_id=app_id,
             app_name=registration_data.app_name,
             app_version=registration_data.app_version,
@@ -258,21 +449,17 @@ class AuthManager:
             webhook_url=registration_data.webhook_url,
             created_at=datetime.now(timezone.utc).isoformat()
         )
-        
-        # 保存到数据库
-        await self._save_app_registration(app_registration)
-        
-        return app_registration
     
     def _generate_app_id(self, app_name: str) -> str:
         """生成App ID"""
-        timestamp = int(time.time())
-        hash_input = f"{app_name}_{timestamp}_{uuid.uuid4()}"
-        return hashlib.sha256(hash_input.encode()).hexdigest()[:16]
+        # 直接对原始字节做哈希，分段update，不拼接中间缓冲区
+        digest = hashlib.sha256(_APP_ID_SEED.pack(int(time.time()), uuid.uuid4().bytes))
+        digest.update(app_name.encode())
+        return digest.hexdigest()[:16]
     
     def _generate_api_key(self) -> str:
         """生成API密钥"""
-        return f"byo_{uuid.uuid4().hex}"
+        return "byo_" + secrets.token_hex(16)
     
     def _validate_permissions(self, requested: List[str]) -> Set[AppPermission]:
         """验证和授予权限"""
@@ -299,35 +486,73 @@ class AuthManager:
     async def _save_app_registration(self, registration: AppRegistration):
         """保存App注册信息"""
         async with self.db_pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO app_registrations 
-                (app_id, app_name, app_version, developer, description, permissions,
-                 api_key, webhook_url, rate_limit, created_at, is_active)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-            ''',
-                registration.app_id, registration.app_name, registration.app_version,
-                registration.developer, registration.description,
-                json.dumps([p.value for p in registration.permissions]),
-                registration.api_key, registration.webhook_url, registration.rate_limit,
-                registration.created_at, registration.is_active
-            )
+            await conn.execute(self.INSERT_REGISTRATION_SQL, *self._registration_record(registration))
+    
+    def _registration_record(self, registration: AppRegistration) -> Tuple:
+        """app_registrations表的一行，参数顺序同INSERT_REGISTRATION_SQL"""
+        return (
+            registration.app_id, registration.app_name, registration.app_version,
+            registration.developer, registration.description,
+            json.dumps([p.value for p in registration.permissions]),
+            registration.api_key, registration.webhook_url, registration.rate_limit,
+            registration.created_at, registration.is_active
+        )
     
     async def authenticate_app(self, api_key: str) -> Optional[AppRegistration]:
         """验证App API密钥"""
+        local_app = self._local_auth.get(api_key)
+        if local_app:
+            self._last_active[local_app.app_id] = time.time()
+            return local_app
+        
         # 检查缓存
         cached_app = await self.redis_pool.get(f"app_auth:{api_key}")
         if cached_app:
-            app_data = json.loads(cached_app)
-            permissions = {AppPermission(p) for p in app_data['permissions']}
-            app_data['permissions'] = permissions
-            return AppRegistration(**app_data)
+            app = self._app_from_cache(cached_app)
+        else:
+            app = await self._load_app(api_key)
         
-        # 从数据库查询
+        if app:
+            self._local_auth[api_key] = app
+            self._last_active[app.app_id] = time.time()
+        return app
+    
+    async def flush_last_active(self, interval: float = 10.0):
+        """定期把累积的最近活跃时间用一条UPDATE写回，请求路径上不产生数据库写入"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self._last_active:
+                continue
+            
+            pending, self._last_active = self._last_active, {}
+            app_ids = list(pending)
+            timestamps = [datetime.fromtimestamp(pending[app_id], timezone.utc) for app_id in app_ids]
+            try:
+                async with self.db_pool.acquire() as conn:
+                    await conn.execute('''
+                        UPDATE app_registrations AS a SET last_active = v.last_active
+                        FROM (SELECT unnest($1::text[]) AS app_id,
+                                     unnest($2::timestamptz[]) AS last_active) AS v
+                        WHERE a.app_id = v.app_id
+                    ''', app_ids, timestamps)
+            except Exception:
+                # 写回失败时合并回待写集合，保留更新的时间戳
+                for app_id, ts in pending.items():
+                    if self._last_active.get(app_id, 0) < ts:
+                        self._last_active[app_id] = ts
+    
+    def _app_from_cache(self, cached_app) -> AppRegistration:
+        """从缓存的认证结果还原App注册信息"""
+        app_data = orjson.loads(cached_app)
+        permissions = {AppPermission(p) for p in app_data['permissions']}
+        app_data['permissions'] = permissions
+        return AppRegistration(**app_data)
+    
+    async def _load_app(self, api_key: str) -> Optional[AppRegistration]:
+        """从数据库查询App并缓存认证结果"""
         async with self.db_pool.acquire() as conn:
-            row = await conn.fetchrow(
-                'SELECT * FROM app_registrations WHERE api_key = $1 AND is_active = TRUE',
-                api_key
-            )
+            auth_stmt = await conn.auth_statement()
+            row = await auth_stmt.fetchrow(api_key)
             
             if row:
                 permissions = {AppPermission(p) for p in json.loads(row['permissions'])}
@@ -347,12 +572,15 @@ class AuthManager:
                 )
                 
                 # 缓存认证结果
-                cache_data = asdict(app_registration)
+                # 浅拷贝即可：permissions随后被替换，其余字段都是不可变值
+                cache_data = {**app_registration.__dict__}
                 cache_data['permissions'] = [p.value for p in permissions]
+                del cache_data['permission_mask']
+                del cache_data['permission_values']
                 await self.redis_pool.setex(
                     f"app_auth:{api_key}",
                     3600,  # 1小时缓存
-                    json.dumps(cache_data, default=str)
+                    orjson.dumps(cache_data, default=str)
                 )
                 
                 return app_registration
@@ -361,29 +589,60 @@ class AuthManager:
     
     def generate_user_token(self, user_id: str, app_id: str) -> str:
         """生成用户会话token"""
+        now = int(time.time())
         payload = {
             'user_id': user_id,
             'app_id': app_id,
-            'exp': datetime.utcnow() + timedelta(hours=24),
-            'iat': datetime.utcnow()
+            'exp': now + 24 * 3600,
+            'iat': now
         }
-        return jwt.encode(payload, self.jwt_secret, algorithm=self.jwt_algorithm)
+        signing_input = self._jwt_header_b64 + b"." + _b64url_encode(orjson.dumps(payload))
+        return (signing_input + b"." + _b64url_encode(self._jwt_sign(signing_input))).decode()
     
     def verify_user_token(self, token: str) -> Optional[Dict[str, str]]:
         """验证用户token"""
         try:
-            payload = jwt.decode(token, self.jwt_secret, algorithms=[self.jwt_algorithm])
+            signing_input, _, signature = token.encode().rpartition(b".")
+            header_b64, _, payload_b64 = signing_input.partition(b".")
+            if header_b64 != self._jwt_header_b64:
+                return None
+            if not hmac.compare_digest(self._jwt_sign(signing_input), _b64url_decode(signature)):
+                return None
+            
+            payload = orjson.loads(_b64url_decode(payload_b64))
+            if payload['exp'] < time.time():
+                return None
             return {
                 'user_id': payload['user_id'],
                 'app_id': payload['app_id']
             }
-        except jwt.InvalidTokenError:
+        except (ValueError, KeyError, TypeError):
             return None
+    
+    def _jwt_sign(self, signing_input: bytes) -> bytes:
+        """计算HS256签名"""
+        mac = self._jwt_hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
 
 
 class PrivacyFilter:
     """隐私过滤器"""
     
+    _DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+    # 所有敏感模式都至少包含一个数字（\d含全角等Unicode数字）或@，最短的可能匹配是形如a@b.cc的邮箱
+    _PII_TRIGGER = re.compile(r'[\d@]')
+    _MIN_PII_LENGTH = 6
+    # 主题关键词 -> (优先级, 类别)，多个关键词同时出现时取优先级最高的类别
+    _TOPIC_KEYWORDS = {
+        'programming': (0, 'software development'),
+        'coding': (0, 'software development'),
+        'machine learning': (1, 'artificial intelligence'),
+        'ai': (1, 'artificial intelligence'),
+        'design': (2, 'design'),
+    }
+    _NUMBER_PATTERN = re.compile(r'\d+')
+    
     def __init__(self):
         self.sensitive_patterns = [
             r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',  # 信用卡号
@@ -391,29 +650,67 @@ class PrivacyFilter:
             r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # 邮箱
             r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',  # 电话号码
         ]
+        # 预编译后按原顺序逐个替换：合并为单个交替模式会改变重叠匹配的结果，
+        # 前一个模式替换后的文本才是后一个模式的输入
+        self._compiled_patterns = tuple(re.compile(p) for p in self.sensitive_patterns)
+        
+        # 主题关键词编译为Aho-Corasick自动机，一次线性扫描找出全部命中
+        self._topic_ac = ahocorasick.Automaton()
+        for keyword, category in self._TOPIC_KEYWORDS.items():
+            self._topic_ac.add_word(keyword, category)
+        self._topic_ac.make_automaton()
+        
+        # 权限集合 -> 过滤计划；权限集合只能是AppPermission的子集，数量有限
+        self._plans: Dict[FrozenSet[AppPermission], Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
     
     def filter_psp_context(self, psp_context: Dict[str, Any], app_permissions: Set[AppPermission]) -> Dict[str, Any]:
         """为App过滤PSP上下文"""
-        filtered_context = {}
-        
+        return self.plan_for(frozenset(app_permissions))(psp_context)
+    
+    def plan_for(self, app_permissions: FrozenSet[AppPermission]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """按权限集合取得过滤计划，App权限固定，权限判断只在生成计划时做一次"""
+        try:
+            return self._plans[app_permissions]
+        except KeyError:
+            plan = self._plans[app_permissions] = self._build_plan(app_permissions)
+            return plan
+    
+    def _build_plan(self, app_permissions: FrozenSet[AppPermission]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """按权限集合生成过滤计划"""
+        steps = []
         # 基础信息（所有App可见）
         if AppPermission.PSP_READ in app_permissions:
-            filtered_context.update({
-                'core_interests': self._generalize_interests(psp_context.get('core_interests', [])),
-                'learning_preferences': self._abstract_preferences(psp_context.get('learning_preferences', [])),
-                'active_components_count': psp_context.get('active_components_count', 0)
-            })
-        
+            steps.append(self._copy_basic_context)
         # 详细上下文（需要特殊权限）
         if AppPermission.PSP_CONTEXT in app_permissions:
-            filtered_context.update({
-                'current_goals': self._anonymize_goals(psp_context.get('current_goals', [])),
-                'communication_style': psp_context.get('communication_style', []),
-                'high_priority_focus': self._generalize_focus(psp_context.get('high_priority_focus', []))
-            })
+            steps.append(self._copy_detailed_context)
+        steps = tuple(steps)
+        remove_pii = self._remove_pii
+        
+        def plan(psp_context: Dict[str, Any]) -> Dict[str, Any]:
+            filtered_context = {}
+            for step in steps:
+                step(psp_context, filtered_context)
+            # 移除个人标识信息
+            return remove_pii(filtered_context)
         
-        # 移除个人标识信息
-        return self._remove_pii(filtered_context)
+        return plan
+    
+    def _copy_basic_context(self, psp_context: Dict[str, Any], filtered_context: Dict[str, Any]):
+        """复制泛化后的基础信息"""
+        filtered_context.update({
+            'core_interests': self._generalize_interests(psp_context.get('core_interests', [])),
+            'learning_preferences': self._abstract_preferences(psp_context.get('learning_preferences', [])),
+            'active_components_count': psp_context.get('active_components_count', 0)
+        })
+    
+    def _copy_detailed_context(self, psp_context: Dict[str, Any], filtered_context: Dict[str, Any]):
+        """复制匿名化后的详细上下文"""
+        filtered_context.update({
+            'current_goals': self._anonymize_goals(psp_context.get('current_goals', [])),
+            'communication_style': psp_context.get('communication_style', []),
+            'high_priority_focus': self._generalize_focus(psp_context.get('high_priority_focus', []))
+        })
     
     def _generalize_interests(self, interests: List[str]) -> List[str]:
         """泛化兴趣信息"""
@@ -450,44 +747,86 @@ class PrivacyFilter:
     def _abstract_topic(self, topic: str) -> str:
         """抽象化主题"""
         # 简化实现：移除具体名称，保留类别
-        topic_lower = topic.lower()
-        if 'programming' in topic_lower or 'coding' in topic_lower:
-            return 'software development'
-        elif 'machine learning' in topic_lower or 'ai' in topic_lower:
-            return 'artificial intelligence'
-        elif 'design' in topic_lower:
-            return 'design'
-        else:
-            return 'general topic'
+        hits = [category for _, category in self._topic_ac.iter(topic.lower())]
+        return min(hits)[1] if hits else 'general topic'
     
     def _remove_specifics(self, text: str) -> str:
         """移除具体信息"""
         # 移除日期、时间、具体数字等
-        import re
-        text = re.sub(r'\d{4}-\d{2}-\d{2}', '[DATE]', text)
-        text = re.sub(r'\d+', '[NUMBER]', text)
+        text = self._DATE_PATTERN.sub('[DATE]', text)
+        text = self._NUMBER_PATTERN.sub('[NUMBER]', text)
         return text if text != '[DATE]' and text != '[NUMBER]' else ''
     
     def _remove_pii(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """移除个人识别信息"""
-        import re
-        
-        def clean_string(s: str) -> str:
-            for pattern in self.sensitive_patterns:
-                s = re.sub(pattern, '[REDACTED]', s)
-            return s
-        
-        def clean_recursive(obj):
-            if isinstance(obj, dict):
-                return {k: clean_recursive(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [clean_recursive(item) for item in obj]
-            elif isinstance(obj, str):
-                return clean_string(obj)
-            else:
-                return obj
+        # 显式栈代替递归，沿途复制容器，不修改调用方传入的对象
+        cleaned = dict(data)
+        stack = [cleaned]
+        while stack:
+            container = stack.pop()
+            items = container.items() if isinstance(container, dict) else enumerate(container)
+            for key, value in items:
+                if isinstance(value, str):
+                    # 过短或不含数字和@的字符串不可能匹配，跳过正则引擎
+                    if len(value) >= self._MIN_PII_LENGTH and self._PII_TRIGGER.search(value):
+                        for pattern in self._compiled_patterns:
+                            value = pattern.sub('[REDACTED]', value)
+                        container[key] = value
+                elif isinstance(value, dict):
+                    container[key] = value = dict(value)
+                    stack.append(value)
+                elif isinstance(value, list):
+                    container[key] = value = list(value)
+                    stack.append(value)
         
-        return clean_recursive(data)
+        return cleaned
+
+
+class EmbeddingBatcher:
+    """查询向量批处理器：合并并发请求，一次前向计算处理整批问题"""
+    
+    def __init__(self, embedding_model, max_batch: int = 32, max_wait_ms: float = 5):
+        self.embedding_model = embedding_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """提交一个文本，返回float32向量"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def run(self):
+        """后台任务：收集至多max_batch个请求或等待max_wait后统一编码"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await asyncio.to_thread(
+                    self.embedding_model.encode, texts, convert_to_numpy=True
+                )
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
 
 
 class AppIntegrationAPI:
@@ -498,7 +837,8 @@ class AppIntegrationAPI:
         self.app = FastAPI(
             title="ByenatOS App Integration API",
             description="ByenatOS应用集成API",
-            version="1.0.0"
+            version="1.0.0",
+            default_response_class=ORJSONResponse
         )
         
         # 中间件
@@ -514,8 +854,18 @@ class AppIntegrationAPI:
         # 初始化组件
         self.auth_manager = None
         self.rate_limiter = None
+        self._last_active_task = None
+        self._rate_clock_task = None
         self.privacy_filter = PrivacyFilter()
         self.hinata_processor = None
+        self.redis_pool = None
+        self.embedding_batcher = None
+        self._logger = logging.getLogger(__name__)
+        # 规范化问题 -> 查询向量；模型重载时调用invalidate_query_vectors清空
+        self._query_vector_cache = LRUCache(maxsize=4096)
+        self._embedding_task = None
+        # (用户ID, PSP版本, 权限集合) -> 隐私过滤后的PSP摘要
+        self._psp_summary_cache = LRUCache(maxsize=10000)
         self.psp_engine = None
         self.storage_engine = None
         
@@ -525,12 +875,26 @@ class AppIntegrationAPI:
     async def initialize(self):
         """初始化API服务"""
         # 初始化数据库连接
-        db_pool = await asyncpg.create_pool(self.config['postgres_dsn'])
+        # 连接池大小按连接预算在各worker间分摊；asyncpg在建池时即建立min_size个连接，
+        # 预编译语句缓存不过期，各路由的常用查询在每个连接上只需准备一次
+        min_size, max_size = worker_pool_limits(self.config)
+        db_pool = await asyncpg.create_pool(
+            self.config['postgres_dsn'],
+            min_size=min_size,
+            max_size=max_size,
+            max_inactive_connection_lifetime=300,
+            statement_cache_size=1024,
+            max_cached_statement_lifetime=0,
+            connection_class=APIConnection
+        )
         redis_pool = aioredis.from_url(self.config['redis_url'])
+        self.redis_pool = redis_pool
         
         # 初始化组件
         self.auth_manager = AuthManager(db_pool, redis_pool)
         self.rate_limiter = RateLimiter(redis_pool)
+        self._last_active_task = asyncio.create_task(self.auth_manager.flush_last_active())
+        self._rate_clock_task = asyncio.create_task(self.rate_limiter.tick())
         
         self.hinata_processor = HiNATAProcessor(
             self.config['redis_url'],
@@ -538,6 +902,10 @@ class AppIntegrationAPI:
         )
         await self.hinata_processor.initialize()
         
+        # 查询向量与HiNATA入库向量使用同一个已加载的嵌入模型
+        self.embedding_batcher = EmbeddingBatcher(self.hinata_processor.enhancer.embedding_model)
+        self._embedding_task = asyncio.create_task(self.embedding_batcher.run())
+        
         self.psp_engine = PSPEngine(db_pool)
         
         self.storage_engine = StorageEngine(self.config)
@@ -545,6 +913,20 @@ class AppIntegrationAPI:
         
         # 创建数据库表
         await self._create_tables(db_pool)
+        
+        # 预热嵌入模型和检索索引，首个查询不再承担冷启动开销
+        if self.config.get('warmup', True):
+            await self._warmup()
+    
+    async def _warmup(self):
+        """加载嵌入模型权重并预热数据库与Redis连接；不执行检索，避免为虚构用户创建向量集合。
+        预热失败只记录日志，不影响服务启动"""
+        try:
+            await self.embedding_batcher.embed("warmup")
+            await self.auth_manager.db_pool.fetchval("SELECT 1")
+            await self.redis_pool.ping()
+        except Exception:
+            self._logger.warning("Warmup failed, first requests will pay the cold-start cost", exc_info=True)
     
     async def _create_tables(self, db_pool):
         """创建API相关数据库表"""
@@ -604,24 +986,50 @@ class AppIntegrationAPI:
                 )
             return app
         
-        async def check_permission(required_permission: AppPermission):
-            """检查权限装饰器"""
-            def permission_checker(app: AppRegistration = Depends(get_current_app)):
-                if required_permission not in app.permissions:
+        def authorize(required_permission: AppPermission):
+            """认证、权限和速率限制合并为一个依赖；只有通过认证和权限检查的请求才计入配额"""
+            required_bit = _PERMISSION_BITS[required_permission]
+            
+            async def preflight_checker(
+                request: Request,
+                response: Response,
+                credentials: HTTPAuthorizationCredentials = Security(security)
+            ) -> AppRegistration:
+                try:
+                    scope = msgspec.json.decode(await request.body(), type=_RequestScope)
+                    user_id = scope.user_id or "system"
+                except msgspec.DecodeError:
+                    user_id = "system"
+                
+                app = await self.auth_manager.authenticate_app(credentials.credentials)
+                if not app:
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail="Invalid API key"
+                    )
+                if not app.permission_mask & required_bit:
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
                         detail=f"Permission {required_permission.value} required"
                     )
+                
+                current_count = await self.rate_limiter.hit(app.app_id, user_id)
+                if current_count > app.rate_limit:
+                    raise HTTPException(
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        detail="Rate limit exceeded"
+                    )
+                
+                # 剩余配额来自同一次计数结果，随响应头返回，调用方无需再查询指标接口
+                remaining_quota = app.rate_limit - current_count
+                response.headers["X-RateLimit-Limit"] = str(app.rate_limit)
+                response.headers["X-RateLimit-Remaining"] = str(remaining_quota)
+                
+                request.state.app = app
+                request.state.request_count = current_count
+                request.state.remaining_quota = remaining_quota
                 return app
-            return permission_checker
-        
-        async def check_rate_limit(app: AppRegistration, user_id: str = None):
-            """检查速率限制"""
-            if not await self.rate_limiter.check_rate_limit(app.app_id, user_id or "system", app.rate_limit):
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded"
-                )
+            return preflight_checker
         
         # 1. App注册接口
         @self.app.post("/api/apps/register", response_model=AppRegistrationResponse)
@@ -646,23 +1054,36 @@ class AppIntegrationAPI:
         # 2. HiNATA提交接口
         @self.app.post("/api/hinata/submit", response_model=HiNATASubmissionResponse)
         async def submit_hinata_batch(
-            submission: HiNATABatchSubmissionModel,
-            app: AppRegistration = Depends(check_permission(AppPermission.HINATA_SUBMIT))
+            request: Request,
+            app: AppRegistration = Depends(authorize(AppPermission.HINATA_SUBMIT))
         ):
             """提交HiNATA数据批次"""
             start_time = time.time()
             
-            # 检查速率限制
-            await check_rate_limit(app, submission.user_id)
+            try:
+                submission = msgspec.json.decode(await request.body(), type=HiNATABatchSubmission)
+            except msgspec.DecodeError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=str(e)
+                )
             
             try:
                 # 转换为内部格式
-                hinata_batch = [asdict(hinata) for hinata in submission.hinata_batch]
+                hinata_batch = msgspec.to_builtins(submission.hinata_batch)
                 
-                # 处理HiNATA
-                results = await self.hinata_processor.process_hinata_batch(
-                    hinata_batch, submission.user_id
-                )
+                # 分块并发处理HiNATA，块内仍批量写库，块间重叠增强和存储I/O
+                semaphore = asyncio.Semaphore(HINATA_CHUNK_CONCURRENCY)
+                
+                async def process_chunk(chunk):
+                    async with semaphore:
+                        return await self.hinata_processor.process_hinata_batch(chunk, submission.user_id)
+                
+                chunk_results = await asyncio.gather(*(
+                    process_chunk(hinata_batch[i:i + HINATA_CHUNK_SIZE])
+                    for i in range(0, len(hinata_batch), HINATA_CHUNK_SIZE)
+                ))
+                results = [result for chunk in chunk_results for result in chunk]
                 
                 # 统计结果
                 successful_count = sum(1 for r in results if r.status.value == "completed")
@@ -687,13 +1108,10 @@ class AppIntegrationAPI:
         @self.app.post("/api/psp/context", response_model=PSPContextResponse)
         async def get_psp_context(
             request: PSPContextRequestModel,
-            app: AppRegistration = Depends(check_permission(AppPermission.PSP_READ))
+            app: AppRegistration = Depends(authorize(AppPermission.PSP_READ))
         ):
             """获取用户PSP上下文"""
             
-            # 检查速率限制
-            await check_rate_limit(app, request.user_id)
-            
             try:
                 # 获取PSP上下文
                 raw_context = await self.psp_engine.get_psp_context_for_prompt(
@@ -701,9 +1119,7 @@ class AppIntegrationAPI:
                 )
                 
                 # 隐私过滤
-                filtered_context = self.privacy_filter.filter_psp_context(
-                    raw_context, app.permissions
-                )
+                filtered_context = self.privacy_filter.plan_for(frozenset(app.permissions))(raw_context)
                 
                 return PSPContextResponse(
                     user_id=request.user_id,
@@ -722,18 +1138,13 @@ class AppIntegrationAPI:
         @self.app.post("/api/hinata/search", response_model=RetrievalResponse)
         async def search_hinata(
             query: RetrievalQueryModel,
-            app: AppRegistration = Depends(check_permission(AppPermission.STORAGE_ACCESS))
+            app: AppRegistration = Depends(authorize(AppPermission.STORAGE_ACCESS))
         ):
             """检索HiNATA数据"""
             start_time = time.time()
             
-            # 检查速率限制
-            await check_rate_limit(app, query.user_id)
-            
             try:
                 # 构建检索查询
-                from Kernel.Core.StorageEngine import RetrievalQuery
-                
                 retrieval_query = RetrievalQuery(
                     user_id=query.user_id,
                     query_type="multi_strategy",
@@ -748,27 +1159,24 @@ class AppIntegrationAPI:
                 results = await self.storage_engine.multi_strategy_search(retrieval_query)
                 
                 # 格式化结果（移除敏感信息）
-                formatted_results = []
-                for result in results:
-                    formatted_result = {
+                formatted_results = [
+                    {
                         'hinata_id': result.hinata_id,
                         'relevance_score': result.relevance_score,
                         'content_summary': result.content_summary,
-                        'metadata': {
-                            'source': result.metadata.get('source', ''),
-                            'timestamp': result.metadata.get('timestamp', ''),
-                            'quality_score': result.metadata.get('quality_score', 0)
-                        }
+                        'metadata': dict(zip(SEARCH_METADATA_FIELDS, _search_metadata(result.metadata)))
                     }
-                    formatted_results.append(formatted_result)
+                    for result in results
+                ]
                 
                 query_time = time.time() - start_time
                 
-                return RetrievalResponse(
-                    total_results=len(results),
-                    results=formatted_results,
-                    query_time=query_time
-                )
+                # 序列化在try内完成，出错时返回500而不是截断的200响应
+                return ORJSONResponse({
+                    'total_results': len(results),
+                    'results': formatted_results,
+                    'query_time': query_time
+                })
                 
             except Exception as e:
                 raise HTTPException(
@@ -780,26 +1188,18 @@ class AppIntegrationAPI:
         @self.app.post("/api/hinata/query-relevant", response_model=HiNATAQueryResponse)
         async def query_relevant_hinata(
             query: HiNATAQueryModel,
-            app: AppRegistration = Depends(check_permission(AppPermission.HINATA_QUERY))
+            app: AppRegistration = Depends(authorize(AppPermission.HINATA_QUERY))
         ):
             """根据问题检索相关HiNATA内容"""
             start_time = time.time()
             
-            # 检查速率限制
-            await check_rate_limit(app, query.user_id)
-            
             try:
                 # 生成查询向量（使用本地模型）
                 query_vector = await self._generate_query_vector(query.question)
                 
                 # 构建检索查询
-                from Kernel.Core.StorageEngine import RetrievalQuery
-                
-                retrieval_query = RetrievalQuery(
-                    user_id=query.user_id,
-                    query_type="question_focused",  # 专门针对问题的检索类型
-                    query_text=query.question,
-                    semantic_vector=query_vector,
+                retrieval_query = self._question_query(
+                    query.user_id, query.question, query_vector,
                     limit=query.limit,
                     min_relevance_score=query.min_relevance_score
                 )
@@ -808,23 +1208,7 @@ class AppIntegrationAPI:
                 results = await self.storage_engine.multi_strategy_search(retrieval_query)
                 
                 # 格式化结果
-                formatted_hinata = []
-                for result in results:
-                    hinata_item = {
-                        'hinata_id': result.hinata_id,
-                        'content_summary': result.content_summary,
-                        'relevance_score': result.relevance_score,
-                    }
-                    
-                    if query.include_metadata:
-                        hinata_item['metadata'] = {
-                            'source': result.metadata.get('source', ''),
-                            'timestamp': result.metadata.get('timestamp', ''),
-                            'attention_weight': result.metadata.get('attention_weight', 0),
-                            'quality_score': result.metadata.get('quality_score', 0)
-                        }
-                    
-                    formatted_hinata.append(hinata_item)
+                formatted_hinata = [_format_hinata(result, query.include_metadata) for result in results]
                 
                 query_time = time.time() - start_time
                 
@@ -842,38 +1226,64 @@ class AppIntegrationAPI:
                     detail=f"HiNATA query failed: {str(e)}"
                 )
         
+        @self.app.post("/api/hinata/query-relevant/stream")
+        async def stream_relevant_hinata(
+            query: HiNATAQueryModel,
+            app: AppRegistration = Depends(authorize(AppPermission.HINATA_QUERY))
+        ):
+            """根据问题检索相关HiNATA内容，以NDJSON逐行流式返回，不构建响应模型"""
+            try:
+                query_vector = await self._generate_query_vector(query.question)
+                retrieval_query = self._question_query(
+                    query.user_id, query.question, query_vector,
+                    limit=query.limit,
+                    min_relevance_score=query.min_relevance_score
+                )
+                results = await self.storage_engine.multi_strategy_search(retrieval_query)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"HiNATA query failed: {str(e)}"
+                )
+            
+            include_metadata = query.include_metadata
+            
+            async def stream_results():
+                for result in results:
+                    yield orjson.dumps(
+                        _format_hinata(result, include_metadata),
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+                    )
+            
+            return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+        
         # 6. 个性化增强接口（PSP + HiNATA结合）
         @self.app.post("/api/enhancement/personalized", response_model=PersonalizedEnhancementResponse)
         async def get_personalized_enhancement(
             request: PersonalizedEnhancementModel,
-            app: AppRegistration = Depends(check_permission(AppPermission.ENHANCEMENT_ACCESS))
+            app: AppRegistration = Depends(authorize(AppPermission.ENHANCEMENT_ACCESS))
         ):
             """获取个性化增强内容（PSP + 相关HiNATA）"""
             start_time = time.time()
             
-            # 检查速率限制
-            await check_rate_limit(app, request.user_id)
-            
             try:
-                # 并行获取PSP和相关HiNATA
+                # 并行获取PSP和相关HiNATA：查询向量生成不依赖PSP，与PSP查询同时进行
                 psp_task = self.psp_engine.get_psp_context_for_prompt(
                     request.user_id, request.question
                 )
                 
-                # 获取相关HiNATA（复用上面的逻辑）
-                query_vector = await self._generate_query_vector(request.question)
-                retrieval_query = RetrievalQuery(
-                    user_id=request.user_id,
-                    query_type="question_focused",
-                    query_text=request.question,
-                    semantic_vector=query_vector,
-                    limit=request.context_limit,
-                    min_relevance_score=0.5
-                )
-                hinata_task = self.storage_engine.multi_strategy_search(retrieval_query)
+                async def search_knowledge():
+                    # 获取相关HiNATA（复用上面的逻辑），向量就绪后立即检索
+                    query_vector = await self._generate_query_vector(request.question)
+                    retrieval_query = self._question_query(
+                        request.user_id, request.question, query_vector,
+                        limit=request.context_limit,
+                        min_relevance_score=0.5
+                    )
+                    return await self.storage_engine.multi_strategy_search(retrieval_query)
                 
                 # 等待两个任务完成
-                psp_context, hinata_results = await asyncio.gather(psp_task, hinata_task)
+                psp_context, hinata_results = await asyncio.gather(psp_task, search_knowledge())
                 
                 # 生成个性化提示词
                 personalized_prompt = await self._generate_personalized_prompt(
@@ -881,20 +1291,17 @@ class AppIntegrationAPI:
                 )
                 
                 # 格式化HiNATA知识组件
-                knowledge_components = []
-                for result in hinata_results:
-                    knowledge_item = {
-                        'content_summary': result.content_summary,
-                        'relevance_score': result.relevance_score,
-                        'source': result.metadata.get('source', ''),
-                        'timestamp': result.metadata.get('timestamp', ''),
-                        'component_type': 'knowledge'  # 明确标识为知识组件
-                    }
-                    knowledge_components.append(knowledge_item)
+                if request.knowledge_layout == "columns":
+                    knowledge_components = []
+                    knowledge_columns = _knowledge_columns(hinata_results)
+                else:
+                    knowledge_components = [_format_knowledge(result) for result in hinata_results]
+                    knowledge_columns = None
                 
-                # 生成PSP摘要（隐私过滤后）
-                psp_summary = self.privacy_filter.filter_psp_context(
-                    psp_context, app.permissions
+                # 生成PSP摘要（隐私过滤后），仅在调用方需要时计算
+                psp_summary = (
+                    self._psp_summary(request.user_id, psp_context, app.permissions)
+                    if request.include_psp_details else {}
                 )
                 
                 processing_time = time.time() - start_time
@@ -904,7 +1311,8 @@ class AppIntegrationAPI:
                     question=request.question,
                     personalized_prompt=personalized_prompt,  # PSP个性化组件
                     knowledge_components=knowledge_components,  # HiNATA知识组件
-                    psp_summary=psp_summary if request.include_psp_details else {},
+                    knowledge_columns=knowledge_columns,
+                    psp_summary=psp_summary,
                     processing_time=processing_time
                 )
                 
@@ -936,7 +1344,7 @@ class AppIntegrationAPI:
             return {
                 "status": "healthy",
                 "version": "1.0.0",
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": utc_now_iso()
             }
         
         @self.app.get("/api/apps/{app_id}/metrics")
@@ -945,7 +1353,7 @@ class AppIntegrationAPI:
             app: AppRegistration = Depends(get_current_app)
         ):
             """获取App使用指标"""
-            if app.app_id != app_id and AppPermission.ADMIN not in app.permissions:
+            if app.app_id != app_id and not app.has_permission(AppPermission.ADMIN):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Access denied"
@@ -969,18 +1377,62 @@ class AppIntegrationAPI:
             """健康检查"""
             return {"status": "ok"}
     
-    async def _generate_query_vector(self, question: str) -> List[float]:
-        """生成查询向量"""
+    async def _generate_query_vector(self, question: str) -> Optional[np.ndarray]:
+        """生成查询向量（float32），依次查本地LRU、Redis共享缓存，未命中时由批处理器合并编码"""
+        normalized = question.strip().lower()
+        vector = self._query_vector_cache.get(normalized)
+        if vector is not None:
+            return vector
+        
         try:
-            # 这里应该使用本地的嵌入模型
-            # 暂时返回模拟向量，实际应该调用本地模型
-            import numpy as np
-            # 模拟向量生成 - 实际应该替换为真实的嵌入模型调用
-            vector = np.random.rand(768).tolist()  # 假设使用768维向量
+            # 多进程部署时通过Redis共享，值为float32原始字节
+            model_name = self.config.get('embedding_model', 'all-MiniLM-L6-v2')
+            digest = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+            redis_key = f"query_vector:{model_name}:{digest}"
+            
+            cached_vector = await self.redis_pool.get(redis_key)
+            if cached_vector:
+                vector = np.frombuffer(cached_vector, dtype=np.float32)
+            else:
+                vector = await self.embedding_batcher.embed(normalized)
+                await self.redis_pool.setex(redis_key, 3600, vector.tobytes())
+            
+            self._query_vector_cache[normalized] = vector
             return vector
         except Exception as e:
-            # 如果向量生成失败，返回空列表，系统会使用其他检索策略
-            return []
+            # 如果向量生成失败，返回None，系统会使用其他检索策略
+            return None
+    
+    def _psp_summary(self, user_id: str, psp_context: Dict[str, Any],
+                     permissions: Set[AppPermission]) -> Dict[str, Any]:
+        """获取隐私过滤后的PSP摘要，同一PSP版本和权限集合只过滤一次"""
+        app_permissions = frozenset(permissions)
+        psp_version = psp_context.get('psp_version')
+        if psp_version is None:
+            return self.privacy_filter.plan_for(app_permissions)(psp_context)
+        
+        key = (user_id, psp_version, app_permissions)
+        summary = self._psp_summary_cache.get(key)
+        if summary is None:
+            summary = self.privacy_filter.plan_for(app_permissions)(psp_context)
+            self._psp_summary_cache[key] = summary
+        return summary
+    
+    def invalidate_query_vectors(self):
+        """嵌入模型重载后清空本进程的查询向量缓存"""
+        self._query_vector_cache.clear()
+    
+    def _question_query(self, user_id: str, question: str, query_vector: Optional[np.ndarray],
+                        limit: int, min_relevance_score: float) -> RetrievalQuery:
+        """构建针对问题的检索查询"""
+        return RetrievalQuery(
+            user_id=user_id,
+            query_type="question_focused",  # 专门针对问题的检索类型
+            query_text=question,
+            semantic_vector=query_vector,
+            limit=limit,
+            min_relevance_score=min_relevance_score
+        )
     
     async def _generate_personalized_prompt(self, psp_context: Dict[str, Any], question: str) -> str:
         """
@@ -996,34 +1448,18 @@ class AppIntegrationAPI:
             learning_preferences = psp_context.get('learning_preferences', [])
             communication_style = psp_context.get('communication_style', [])
             
-            # 构建个性化系统提示词（上下文的个性化组件）
-            prompt_parts = []
-            
-            # 基础系统提示
-            prompt_parts.append("You are an AI assistant that provides personalized responses.")
-            
-            # 融入用户个性化信息（PSP组件）
-            if core_interests:
-                interests_str = ", ".join(core_interests[:5])
-                prompt_parts.append(f"User interests: {interests_str}.")
-            
-            if learning_preferences:
-                preferences_str = ", ".join(learning_preferences[:3])
-                prompt_parts.append(f"Learning style: {preferences_str}.")
-            
-            if communication_style:
-                style_str = ", ".join(communication_style[:2])
-                prompt_parts.append(f"Communication style: {style_str}.")
-            
-            # 指导AI如何使用知识组件
-            prompt_parts.append("Use the provided knowledge context to give accurate answers.")
-            prompt_parts.append("Combine your knowledge with the user's personalization preferences.")
-            
-            return " ".join(prompt_parts)
+            # 构建个性化系统提示词（上下文的个性化组件）：基础提示 + PSP组件 + 知识组件使用说明
+            return (
+                _PROMPT_HEAD
+                + (f" User interests: {', '.join(core_interests[:5])}." if core_interests else "")
+                + (f" Learning style: {', '.join(learning_preferences[:3])}." if learning_preferences else "")
+                + (f" Communication style: {', '.join(communication_style[:2])}." if communication_style else "")
+                + _PROMPT_TAIL
+            )
             
         except Exception as e:
             # 如果PSP处理失败，返回通用系统提示词
-            return "You are a helpful AI assistant. Use the provided context to answer questions accurately."
+            return _FALLBACK_PROMPT
     
     def get_app(self) -> FastAPI:
         """获取FastAPI应用实例"""
@@ -1048,13 +1484,27 @@ async def create_app() -> FastAPI:
 
 
 if __name__ == "__main__":
+    import os
+    import sys
     import uvicorn
     
-    # 开发环境启动
+    # 传入--reload时为开发模式（单进程热重载、输出访问日志）；
+    # 否则按生产配置启动：多worker、uvloop事件循环、httptools解析器、关闭访问日志
+    dev_mode = "--reload" in sys.argv[1:]
+    workers = 1 if dev_mode else max(2, (os.cpu_count() or 2) // 2)
+    # worker数经环境变量传给各worker进程，用于按worker分摊数据库连接预算
+    os.environ["WEB_CONCURRENCY"] = str(workers)
     uvicorn.run(
         "ApplicationFramework.APIs.AppIntegrationAPI:create_app",
         host="0.0.0.0",
         port=8080,
-        reload=True,
-        factory=True
-    )
\ No newline at end of file
+        factory=True,
+        reload=dev_mode,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        timeout_keep_alive=30,
+        limit_concurrency=1000,
+        access_log=dev_mode
+    )
@@ -7,13 +7,15 @@ ByenatOS Conversational Write Interface
 """
 
 import asyncio
+import hashlib
 import json
-import time
-from typing import Dict, List, Optional, Any
+import secrets
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
-from datetime import datetime, timezone
 
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Depends, Security, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
 
@@ -22,7 +24,7 @@ from InterfaceAbstraction.APIs.HiNATAWriteAPI import (
     HiNATAWriteAPI, HiNATAWriteRequestModel, HiNATAWriteModel, 
     BulkOperationModel, WriteOperationContext
 )
-from InterfaceAbstraction.APIs.AppIntegrationAPI import AuthManager
+from InterfaceAbstraction.APIs.AppIntegrationAPI import AuthManager, utc_now_iso
 
 
 # 请求模型
@@ -58,7 +60,7 @@ class ConversationalWriteResponse(BaseModel):
     error_message: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class WriteSession:
     """写入会话"""
     session_id: str
@@ -79,7 +81,8 @@ class ConversationalWriteInterface:
         self.app = FastAPI(
             title="ByenatOS Conversational Write Interface",
             description="ByenatOS对话式HiNATA写入接口",
-            version="1.0.0"
+            version="1.0.0",
+            default_response_class=ORJSONResponse
         )
         
         # 初始化组件
@@ -87,8 +90,14 @@ class ConversationalWriteInterface:
         self.write_api = None
         self.auth_manager = None
         
-        # 会话存储（生产环境应使用Redis）
-        self.active_sessions: Dict[str, WriteSession] = {}
+        # 会话存储：有界TTL缓存，过期或超出容量的会话自动淘汰
+        self.active_sessions: TTLCache = TTLCache(
+            maxsize=self.config.get('max_sessions', 10000),
+            ttl=self.config.get('session_ttl', 900)
+        )
+        self._sessions_gc_task: Optional[asyncio.Task] = None
+        # 处理中的对话式写入请求，重复提交的相同请求直接等待已有任务
+        self._inflight: Dict[Tuple[str, bytes, bool, bool], asyncio.Future] = {}
         
         # 设置路由
         self._setup_routes()
@@ -101,6 +110,15 @@ class ConversationalWriteInterface:
         
         # 获取认证管理器
         self.auth_manager = self.write_api.auth_manager
+        
+        # 定期清理过期会话
+        self._sessions_gc_task = asyncio.create_task(self._sessions_gc())
+    
+    async def _sessions_gc(self, interval: float = 60.0):
+        """定期淘汰过期会话，避免空闲期间过期会话长期占用内存"""
+        while True:
+            await asyncio.sleep(interval)
+            self.active_sessions.expire()
     
     def _setup_routes(self):
         """设置API路由"""
@@ -122,78 +140,15 @@ class ConversationalWriteInterface:
             request: ConversationalWriteRequest,
             app = Depends(get_current_app)
         ):
-            """处理对话式写入请求"""
-            
-            try:
-                # 1. 意图识别
-                recognized_intent = self.intent_recognizer.recognize_intent(
-                    request.user_input, 
-                    request.context
-                )
-                
-                session_id = f"session_{int(time.time())}_{request.user_id}"
-                
-                # 2. 检查意图是否有效
-                if recognized_intent.intent_type == IntentType.NONE or recognized_intent.confidence < 0.3:
-                    return ConversationalWriteResponse(
-                        session_id=session_id,
-                        status="no_intent",
-                        intent_recognized=False,
-                        intent_confidence=recognized_intent.confidence,
-                        suggested_action="我没有理解您想要执行的操作。请更具体地描述您希望对知识库进行的修改。",
-                        confirmation_required=False,
-                        next_steps=["请重新描述您的需求", "使用更具体的动词，如'添加'、'删除'、'修改'等"]
-                    )
-                
-                # 3. 构建写入请求
-                write_request = await self._build_write_request(recognized_intent, request)
-                
-                # 4. 创建会话
-                session = WriteSession(
-                    session_id=session_id,
-                    user_id=request.user_id,
-                    recognized_intent=recognized_intent,
-                    write_request=write_request,
-                    created_at=datetime.now(timezone.utc).isoformat()
-                )
-                self.active_sessions[session_id] = session
-                
-                # 5. 执行试运行（如果需要）
-                preview_results = None
-                if request.dry_run:
-                    preview_results = await self._execute_dry_run(write_request, session_id)
-                
-                # 6. 自动执行（如果用户确认）
-                execution_results = None
-                if request.auto_confirm and not request.dry_run:
-                    execution_results = await self._execute_write_operation(write_request, session)
-                    session.executed = True
-                    session.confirmed = True
-                    session.results = execution_results
-                
-                # 7. 生成响应
-                return ConversationalWriteResponse(
-                    session_id=session_id,
-                    status="success",
-                    intent_recognized=True,
-                    intent_confidence=recognized_intent.confidence,
-                    suggested_action=recognized_intent.suggested_confirmation,
-                    confirmation_required=not request.auto_confirm,
-                    preview_results=preview_results,
-                    execution_results=execution_results,
-                    next_steps=self._generate_next_steps(recognized_intent, preview_results)
-                )
-                
-            except Exception as e:
-                return ConversationalWriteResponse(
-                    session_id=f"error_{int(time.time())}",
-                    status="error",
-                    intent_recognized=False,
-                    intent_confidence=0.0,
-                    suggested_action="处理请求时发生错误",
-                    confirmation_required=False,
-                    error_message=str(e)
-                )
+            """处理对话式写入请求（相同用户的相同输入在处理中时共享同一次计算）"""
+            key = self._inflight_key(request)
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._process_conversational_write(request))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # shield：单个客户端断开不会取消其他等待者共享的处理
+            return await asyncio.shield(task)
         
         # 2. 意图确认和执行
         @self.app.post("/api/conversation/confirm", response_model=ConversationalWriteResponse)
@@ -218,7 +173,7 @@ class ConversationalWriteInterface:
             
             if not request.confirmed:
                 # 用户取消操作
-                del self.active_sessions[request.session_id]
+                self.active_sessions.pop(request.session_id, None)
                 return ConversationalWriteResponse(
                     session_id=request.session_id,
                     status="cancelled",
@@ -333,6 +288,87 @@ class ConversationalWriteInterface:
                 "suggested_action": new_intent.suggested_confirmation
             }
     
+    def _inflight_key(self, request: ConversationalWriteRequest) -> Tuple[str, bytes, bool, bool]:
+        """处理中请求的去重键：用户 + 输入与上下文摘要 + 执行选项"""
+        digest = hashlib.blake2b(request.user_input.encode(), digest_size=16)
+        if request.context:
+            digest.update(json.dumps(request.context, sort_keys=True, default=str).encode())
+        return request.user_id, digest.digest(), request.dry_run, request.auto_confirm
+    
+    async def _process_conversational_write(self, request: ConversationalWriteRequest) -> ConversationalWriteResponse:
+        """处理对话式写入请求"""
+        
+        try:
+            # 1. 意图识别
+            recognized_intent = self.intent_recognizer.recognize_intent(
+                request.user_input, 
+                request.context
+            )
+            
+            session_id = secrets.token_urlsafe(16)
+            
+            # 2. 检查意图是否有效
+            if recognized_intent.intent_type == IntentType.NONE or recognized_intent.confidence < 0.3:
+                return ConversationalWriteResponse(
+                    session_id=session_id,
+                    status="no_intent",
+                    intent_recognized=False,
+                    intent_confidence=recognized_intent.confidence,
+                    suggested_action="我没有理解您想要执行的操作。请更具体地描述您希望对知识库进行的修改。",
+                    confirmation_required=False,
+                    next_steps=["请重新描述您的需求", "使用更具体的动词，如'添加'、'删除'、'修改'等"]
+                )
+            
+            # 3. 构建写入请求
+            write_request = await self._build_write_request(recognized_intent, request)
+            
+            # 4. 创建会话
+            session = WriteSession(
+                session_id=session_id,
+                user_id=request.user_id,
+                recognized_intent=recognized_intent,
+                write_request=write_request,
+                created_at=utc_now_iso()
+            )
+            self.active_sessions[session_id] = session
+            
+            # 5. 执行试运行（如果需要）
+            preview_results = None
+            if request.dry_run:
+                preview_results = await self._execute_dry_run(write_request, session_id)
+            
+            # 6. 自动执行（如果用户确认）
+            execution_results = None
+            if request.auto_confirm and not request.dry_run:
+                execution_results = await self._execute_write_operation(write_request, session)
+                session.executed = True
+                session.confirmed = True
+                session.results = execution_results
+            
+            # 7. 生成响应
+            return ConversationalWriteResponse(
+                session_id=session_id,
+                status="success",
+                intent_recognized=True,
+                intent_confidence=recognized_intent.confidence,
+                suggested_action=recognized_intent.suggested_confirmation,
+                confirmation_required=not request.auto_confirm,
+                preview_results=preview_results,
+                execution_results=execution_results,
+                next_steps=self._generate_next_steps(recognized_intent, preview_results)
+            )
+            
+        except Exception as e:
+            return ConversationalWriteResponse(
+                session_id=f"err_{secrets.token_urlsafe(8)}",
+                status="error",
+                intent_recognized=False,
+                intent_confidence=0.0,
+                suggested_action="处理请求时发生错误",
+                confirmation_required=False,
+                error_message=str(e)
+            )
+    
     async def _build_write_request(self, intent: RecognizedIntent, 
                                  request: ConversationalWriteRequest) -> HiNATAWriteRequestModel:
         """构建写入请求"""
@@ -394,7 +430,7 @@ class ConversationalWriteInterface:
             operation_type=write_request.operation_type,
             intent_description=write_request.intent_description,
             source_app="conversational_interface",
-            timestamp=datetime.now(timezone.utc).isoformat()
+            timestamp=utc_now_iso()
         )
         
         # 执行试运行
@@ -423,7 +459,7 @@ class ConversationalWriteInterface:
             operation_type=write_request.operation_type,
             intent_description=write_request.intent_description,
             source_app="conversational_interface",
-            timestamp=datetime.now(timezone.utc).isoformat()
+            timestamp=utc_now_iso()
         )
         
         # 执行写入操作
@@ -442,22 +478,23 @@ class ConversationalWriteInterface:
                                 modifications: Dict[str, Any]) -> HiNATAWriteRequestModel:
         """应用用户修改"""
         
-        # 创建请求副本
-        modified_request = write_request.copy(deep=True)
-        
-        # 应用修改
-        if "target_filter" in modifications and modified_request.bulk_operation:
-            for key, value in modifications["target_filter"].items():
-                modified_request.bulk_operation.target_filter[key] = value
-        
-        if "operation_data" in modifications and modified_request.bulk_operation:
-            for key, value in modifications["operation_data"].items():
-                modified_request.bulk_operation.operation_data[key] = value
+        # 请求已在API边界校验过：只复制被修改的部分，不做深拷贝和重新校验
+        request_update: Dict[str, Any] = {
+            "processing_options": dict(write_request.processing_options)
+        }
         
-        if "batch_size" in modifications and modified_request.bulk_operation:
-            modified_request.bulk_operation.batch_size = modifications["batch_size"]
+        bulk_operation = write_request.bulk_operation
+        if bulk_operation:
+            # 应用修改
+            bulk_update: Dict[str, Any] = {
+                "target_filter": {**bulk_operation.target_filter, **modifications.get("target_filter", {})},
+                "operation_data": {**bulk_operation.operation_data, **modifications.get("operation_data", {})}
+            }
+            if "batch_size" in modifications:
+                bulk_update["batch_size"] = modifications["batch_size"]
+            request_update["bulk_operation"] = bulk_operation.model_copy(update=bulk_update)
         
-        return modified_request
+        return write_request.model_copy(update=request_update)
     
     def _generate_next_steps(self, intent: RecognizedIntent, 
                            preview_results: Optional[Dict[str, Any]]) -> List[str]:
@@ -518,12 +555,24 @@ async def create_conversational_interface() -> FastAPI:
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     
+    # 传入--reload时为开发模式（热重载、输出访问日志）；否则按生产配置启动：
+    # uvloop事件循环、httptools解析器、关闭访问日志。
+    # 会话与进行中的请求保存在进程内，确认请求必须落到创建会话的同一进程，因此固定单worker
+    dev_mode = "--reload" in sys.argv[1:]
     uvicorn.run(
         "InterfaceAbstraction.APIs.ConversationalWriteInterface:create_conversational_interface",
         host="0.0.0.0",
         port=8082,
-        reload=True,
-        factory=True
-    )
\ No newline at end of file
+        factory=True,
+        reload=dev_mode,
+        workers=1,
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        timeout_keep_alive=30,
+        limit_concurrency=1000,
+        access_log=dev_mode
+    )
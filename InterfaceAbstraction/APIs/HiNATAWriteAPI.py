@@ -7,25 +7,33 @@ HiNATA文件系统写入API - 用户知识库内容修改接口
 """
 
 import asyncio
-import json
+import itertools
+import logging
+import os
 import time
 import uuid
 import hashlib
-from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any, Set, Union
+import zlib
+from typing import AsyncIterator, Dict, FrozenSet, List, Optional, Any, Set, Tuple, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
+from functools import lru_cache
 
-from fastapi import FastAPI, HTTPException, Depends, Security, status
+from fastapi import FastAPI, HTTPException, Depends, Response, Security, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field
 import aioredis
 import asyncpg
+import orjson
+from cachetools import TTLCache
 
 # 导入内部组件
 from Kernel.Core.HiNATAProcessor import HiNATAProcessor, HiNATAData
 from Kernel.Core.StorageEngine import StorageEngine
-from InterfaceAbstraction.APIs.AppIntegrationAPI import AuthManager, AppPermission
+from InterfaceAbstraction.APIs.AppIntegrationAPI import (
+    APIConnection, AuthManager, AppPermission, utc_now_iso, worker_pool_limits
+)
 
 
 class HiNATAWriteOperation(Enum):
@@ -48,7 +56,7 @@ class HiNATAWritePermission(Enum):
     HINATA_ADMIN = "hinata_admin"
 
 
-@dataclass
+@dataclass(slots=True)
 class WriteOperationContext:
     """写入操作上下文"""
     user_id: str
@@ -71,7 +79,7 @@ class HiNATAWriteModel(BaseModel):
     note: str = Field(..., max_length=50000, description="用户笔记")
     address: str = Field(..., description="资源地址")
     tag: List[str] = Field(default=[], description="用户标签")
-    access: str = Field(..., regex="^(private|public|shared)$", description="访问级别")
+    access: str = Field(..., pattern="^(private|public|shared)$", description="访问级别")
     raw_data: Dict[str, Any] = Field(default={}, description="原始数据")
 
 
@@ -94,6 +102,8 @@ class BulkOperationModel(BaseModel):
 
 class HiNATAWriteRequestModel(BaseModel):
     """HiNATA写入请求模型"""
+    model_config = ConfigDict(extra='ignore', validate_assignment=False, defer_build=False)
+    
     user_id: str = Field(..., description="用户ID")
     operation_type: str = Field(..., description="操作类型")
     intent_description: str = Field(..., description="用户意图描述")
@@ -145,38 +155,197 @@ class BulkOperationResponse(BaseModel):
     errors: List[str] = Field(default=[])
 
 
+def _jsonb_encode(value: Any) -> str:
+    """jsonb参数编码：直接接受Python对象"""
+    return orjson.dumps(value).decode()
+
+
+class WriteAPIConnection(APIConnection):
+    """写入API数据库连接，建立时注册jsonb编解码器，写入历史查询在每个连接上只准备一次"""
+    __slots__ = ('_history_stmt',)
+    
+    # 由Postgres直接聚合为JSON数组文本，响应时原样拼接，不逐行构建字典
+    HISTORY_SQL = '''
+        SELECT COALESCE(json_agg(t), '[]'::json)::text
+        FROM (
+            SELECT operation_id, operation_type, intent_description, 
+                   affected_count, status, created_at
+            FROM hinata_write_logs 
+            WHERE user_id = $1 
+            ORDER BY created_at DESC 
+            LIMIT $2
+        ) AS t
+    '''
+    
+    @classmethod
+    async def setup(cls, conn: "WriteAPIConnection"):
+        """连接池init回调：注册jsonb编解码器，jsonb列直接收发Python对象；不访问任何业务表"""
+        await conn.set_type_codec(
+            'jsonb', encoder=_jsonb_encode, decoder=orjson.loads,
+            schema='pg_catalog', format='text'
+        )
+    
+    async def history_statement(self):
+        """写入历史查询的预编译语句，首次使用时准备：建池时hinata_write_logs表可能尚未创建"""
+        try:
+            return self._history_stmt
+        except AttributeError:
+            self._history_stmt = await self.prepare(self.HISTORY_SQL)
+            return self._history_stmt
+
+
+# 操作ID：毫秒时间戳 + 进程随机节点号 + 进程内递增计数，同前缀的ID按生成时间有序
+_OPERATION_NODE = os.urandom(4).hex()
+_operation_counter = itertools.count()
+
+
+def _make_operation_id(prefix: str) -> str:
+    """生成操作ID，无需每次读取系统随机源"""
+    return f"{prefix}_{time.time_ns() // 1_000_000:012x}{_OPERATION_NODE}{next(_operation_counter) & 0xFFFFFFFF:08x}"
+
+
+# 路由上检查的App权限值
+_PERM_WRITE = HiNATAWritePermission.HINATA_WRITE.value
+_PERM_DELETE = HiNATAWritePermission.HINATA_DELETE.value
+_PERM_BULK_MODIFY = HiNATAWritePermission.HINATA_BULK_MODIFY.value
+_PERM_ADMIN = HiNATAWritePermission.HINATA_ADMIN.value
+
+# 各写入操作所需的用户写权限，未列出的操作需要hinata_admin
+_REQUIRED_PERMISSION: Dict[HiNATAWriteOperation, str] = {
+    HiNATAWriteOperation.CREATE: "hinata_write",
+    HiNATAWriteOperation.UPDATE: "hinata_write",
+    HiNATAWriteOperation.DELETE: "hinata_delete",
+    HiNATAWriteOperation.BATCH_UPDATE: "hinata_bulk_modify",
+    HiNATAWriteOperation.BULK_TAG: "hinata_bulk_modify",
+    HiNATAWriteOperation.BULK_RETAG: "hinata_bulk_modify",
+    HiNATAWriteOperation.MERGE: "hinata_write",
+    HiNATAWriteOperation.SPLIT: "hinata_write"
+}
+
+# 更新请求中的可写字段 -> hinata_data列名，按此顺序生成SET子句
+_UPDATE_COLUMNS = {
+    'highlight': 'highlight',
+    'note': 'note',
+    'address': 'address',
+    'tag': 'tags',
+    'access': 'access_level',
+}
+
+
+@lru_cache(maxsize=64)
+def _update_sql(fields: Tuple[str, ...], merge_tags: bool) -> str:
+    """按更新字段生成UPDATE ... RETURNING语句（$1为HiNATA ID，$2为user_id），同一字段组合总是得到同一字符串"""
+    assignments = []
+    for index, field in enumerate(fields, start=3):
+        if field == 'tag' and merge_tags:
+            assignments.append(
+                "tags = (SELECT COALESCE(jsonb_agg(DISTINCT t), '[]'::jsonb) "
+                f"FROM jsonb_array_elements_text(COALESCE(hinata_data.tags, '[]'::jsonb) || ${index}::jsonb) AS t)"
+            )
+        else:
+            assignments.append(f"{_UPDATE_COLUMNS[field]} = ${index}")
+    assignments.append("timestamp = NOW()")
+    return (
+        f"UPDATE hinata_data SET {', '.join(assignments)} "
+        "WHERE id = $1 AND user_id = $2 RETURNING id"
+    )
+
+
+# 过滤条件 -> SQL子句模板，{}为参数序号（$1固定为user_id）
+_FILTER_CLAUSES = {
+    'tag': " AND tags::jsonb ? ${}",
+    'source': " AND source = ${}",
+    'start': " AND timestamp >= ${}",
+    'end': " AND timestamp <= ${}",
+}
+
+
+@lru_cache(maxsize=64)
+def _filter_sql(base_query: str, shape: Tuple[str, ...]) -> str:
+    """按过滤条件形状生成SQL；同一形状总是得到同一字符串，连接上的预编译语句缓存可直接命中"""
+    return base_query + "".join(
+        _FILTER_CLAUSES[name].format(index) for index, name in enumerate(shape, start=2)
+    )
+
+
+def _filter_shape(filter_conditions: Dict[str, Any], with_date_range: bool) -> Tuple[Tuple[str, ...], List[Any]]:
+    """提取过滤条件的形状（出现的条件名，按固定顺序）及对应参数"""
+    shape = []
+    params = []
+    if 'tag' in filter_conditions:
+        shape.append('tag')
+        params.append(filter_conditions['tag'])
+    if 'source' in filter_conditions:
+        shape.append('source')
+        params.append(filter_conditions['source'])
+    if with_date_range and 'date_range' in filter_conditions:
+        date_range = filter_conditions['date_range']
+        for bound in ('start', 'end'):
+            if bound in date_range:
+                shape.append(bound)
+                params.append(date_range[bound])
+    return tuple(shape), params
+
+
 class WriteOperationValidator:
     """写入操作验证器"""
     
-    def __init__(self, db_pool):
+    PERMISSION_CACHE_TTL = 300
+    
+    def __init__(self, db_pool, redis_pool):
         self.db_pool = db_pool
+        self.redis_pool = redis_pool
+        # 两级权限缓存：进程内(L1, 10秒) + Redis(L2, 5分钟)，用户ID -> 写权限集合。
+        # user_permissions表目前没有写入接口，直接改表后最长约5分10秒才对所有worker生效
+        self._local_permissions = TTLCache(maxsize=4096, ttl=10)
     
     async def validate_write_permission(self, user_id: str, operation_type: HiNATAWriteOperation) -> bool:
         """验证写入权限"""
         # 检查用户是否有权限修改自己的数据
-        async with self.db_pool.acquire() as conn:
-            result = await conn.fetchrow(
-                "SELECT write_permissions FROM user_permissions WHERE user_id = $1",
-                user_id
+        permissions = await self._get_write_permissions(user_id)
+        return _REQUIRED_PERMISSION.get(operation_type, "hinata_admin") in permissions
+    
+    async def _get_write_permissions(self, user_id: str) -> FrozenSet[str]:
+        """依次查询本地缓存、Redis和数据库获取用户写权限，无权限记录时为空集合"""
+        permissions = self._local_permissions.get(user_id)
+        if permissions is not None:
+            return permissions
+        
+        cache_key = f"write_permissions:{user_id}"
+        cached = await self.redis_pool.get(cache_key)
+        if cached is not None:
+            permissions = frozenset(orjson.loads(cached))
+        else:
+            async with self.db_pool.acquire() as conn:
+                result = await conn.fetchval(
+                    "SELECT write_permissions FROM user_permissions WHERE user_id = $1",
+                    user_id
+                )
+            permissions = frozenset(result or ())
+            await self.redis_pool.setex(
+                cache_key, self.PERMISSION_CACHE_TTL, orjson.dumps(sorted(permissions))
             )
-            
-            if not result:
-                return False
-            
-            permissions = json.loads(result['write_permissions'])
-            required_permission = self._get_required_permission(operation_type)
-            
-            return required_permission in permissions
+        
+        self._local_permissions[user_id] = permissions
+        return permissions
     
     async def validate_hinata_ownership(self, user_id: str, hinata_ids: List[str]) -> Tuple[bool, List[str]]:
         """验证HiNATA所有权"""
         async with self.db_pool.acquire() as conn:
-            query = """
-                SELECT id FROM hinata_data 
-                WHERE id = ANY($1) AND user_id = $2
-            """
-            rows = await conn.fetch(query, hinata_ids, user_id)
-            owned_ids = [row['id'] for row in rows]
+            # 常见情况下全部属于该用户，只比较数量，不回传ID列表
+            owned_count = await conn.fetchval(
+                "SELECT COUNT(DISTINCT id) FROM hinata_data WHERE id = ANY($1::text[]) AND user_id = $2",
+                hinata_ids, user_id
+            )
+            if owned_count == len(set(hinata_ids)):
+                return True, []
+            
+            # 数量不符时再列出无权限的ID用于错误信息
+            rows = await conn.fetch(
+                "SELECT id FROM hinata_data WHERE id = ANY($1::text[]) AND user_id = $2",
+                hinata_ids, user_id
+            )
+            owned_ids = {row['id'] for row in rows}
             
             unauthorized_ids = [id for id in hinata_ids if id not in owned_ids]
             
@@ -201,49 +370,49 @@ class WriteOperationValidator:
         
         return len(errors) == 0, errors
     
-    def _get_required_permission(self, operation_type: HiNATAWriteOperation) -> str:
-        """获取所需权限"""
-        permission_map = {
-            HiNATAWriteOperation.CREATE: "hinata_write",
-            HiNATAWriteOperation.UPDATE: "hinata_write",
-            HiNATAWriteOperation.DELETE: "hinata_delete",
-            HiNATAWriteOperation.BATCH_UPDATE: "hinata_bulk_modify",
-            HiNATAWriteOperation.BULK_TAG: "hinata_bulk_modify",
-            HiNATAWriteOperation.BULK_RETAG: "hinata_bulk_modify",
-            HiNATAWriteOperation.MERGE: "hinata_write",
-            HiNATAWriteOperation.SPLIT: "hinata_write"
-        }
-        return permission_map.get(operation_type, "hinata_admin")
-    
     async def _estimate_affected_count(self, filter_conditions: Dict[str, Any], user_id: str) -> int:
         """估算影响的记录数量"""
         # 简化实现：基于过滤条件估算
+        shape, params = _filter_shape(filter_conditions, with_date_range=False)
+        query = _filter_sql("SELECT COUNT(*) FROM hinata_data WHERE user_id = $1", shape)
         async with self.db_pool.acquire() as conn:
-            base_query = "SELECT COUNT(*) FROM hinata_data WHERE user_id = $1"
-            params = [user_id]
-            
-            # 根据过滤条件添加WHERE子句
-            if 'tag' in filter_conditions:
-                base_query += " AND tags::jsonb ? $2"
-                params.append(filter_conditions['tag'])
-            
-            if 'source' in filter_conditions:
-                base_query += f" AND source = ${len(params) + 1}"
-                params.append(filter_conditions['source'])
-            
-            result = await conn.fetchrow(base_query, *params)
-            return result['count']
+            return await conn.fetchval(query, user_id, *params)
 
 
 class HiNATAWriteProcessor:
     """HiNATA写入处理器"""
     
-    def __init__(self, db_pool, redis_pool, hinata_processor: HiNATAProcessor, storage_engine: StorageEngine):
+    # 批量标签操作：每批一条语句，参数为(目标ID数组, 新标签列表)
+    # bulk_tag在Postgres中与现有标签合并去重，不在Python中逐行解析和序列化标签
+    BULK_TAG_SQL = {
+        "bulk_tag": '''
+            UPDATE hinata_data SET tags = (
+                SELECT COALESCE(jsonb_agg(DISTINCT t), '[]'::jsonb)
+                FROM jsonb_array_elements_text(COALESCE(hinata_data.tags, '[]'::jsonb) || $2::jsonb) AS t
+            )
+            WHERE id = ANY($1::text[])
+        ''',
+        "bulk_retag": "UPDATE hinata_data SET tags = $2::jsonb WHERE id = ANY($1::text[])",
+    }
+    
+    # 试运行样例只投影预览所需的列，不回传note、raw_data、嵌入向量等宽列
+    SAMPLE_QUERY = (
+        "SELECT id, timestamp, source, highlight, address, tags, access_level "
+        "FROM hinata_data WHERE user_id = $1 AND is_deleted = FALSE"
+    )
+    
+    def __init__(self, db_pool, redis_pool, hinata_processor: HiNATAProcessor, storage_engine: StorageEngine,
+                 long_command_timeout: float = 300):
         self.db_pool = db_pool
         self.redis_pool = redis_pool
         self.hinata_processor = hinata_processor
         self.storage_engine = storage_engine
-        self.validator = WriteOperationValidator(db_pool)
+        # 快照聚合、批量游标等随数据量增长的语句不受连接池command_timeout限制，使用单独的超时
+        self.long_command_timeout = long_command_timeout
+        self.validator = WriteOperationValidator(db_pool, redis_pool)
+        # 后台运行中的备份写入任务，持有引用以免任务在完成前被回收
+        self._pending_backups: Set[asyncio.Task] = set()
+        self._logger = logging.getLogger(__name__)
     
     async def process_write_request(self, request: HiNATAWriteRequestModel, context: WriteOperationContext) -> HiNATAWriteResponse:
         """处理写入请求"""
@@ -259,9 +428,14 @@ class HiNATAWriteProcessor:
                     detail="Insufficient permissions for this operation"
                 )
             
-            # 2. 自动备份
+            # 2. 自动备份：快照必须在写入之前取得；压缩和写入Redis在后台进行，不计入响应延迟
             if request.auto_backup:
-                await self._create_backup(request.user_id, context.operation_id)
+                backup_json = await self._snapshot_user_data(request.user_id, context.operation_id)
+                backup_task = asyncio.create_task(
+                    self._store_backup(request.user_id, context.operation_id, backup_json)
+                )
+                self._pending_backups.add(backup_task)
+                backup_task.add_done_callback(self._on_backup_done)
             
             # 3. 执行操作
             results = []
@@ -323,18 +497,11 @@ class HiNATAWriteProcessor:
         # 生成ID
         hinata_id = f"hinata_{context.user_id}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
         
-        # 构建HiNATA数据
-        hinata_dict = {
-            "id": hinata_id,
-            "timestamp": request.hinata_data.timestamp or datetime.now(timezone.utc).isoformat(),
-            "source": request.hinata_data.source,
-            "highlight": request.hinata_data.highlight,
-            "note": request.hinata_data.note,
-            "address": request.hinata_data.address,
-            "tag": request.hinata_data.tag,
-            "access": request.hinata_data.access,
-            "raw_data": request.hinata_data.raw_data
-        }
+        # 构建HiNATA数据：模型字段与HiNATA数据字段一一对应，直接导出
+        hinata_dict = request.hinata_data.model_dump()
+        hinata_dict['id'] = hinata_id
+        if not hinata_dict['timestamp']:
+            hinata_dict['timestamp'] = utc_now_iso()
         
         # 通过HiNATA处理器处理
         results = await self.hinata_processor.process_hinata_batch([hinata_dict], context.user_id)
@@ -358,43 +525,41 @@ class HiNATAWriteProcessor:
         
         update_data = request.update_data
         
-        # 验证所有权
-        is_owner, unauthorized = await self.validator.validate_hinata_ownership(
-            context.user_id, [update_data.id]
-        )
-        if not is_owner:
+        # 只更新请求中出现的可写字段，标签合并在Postgres中完成
+        fields = tuple(field for field in _UPDATE_COLUMNS if field in update_data.updates)
+        merge_tags = update_data.merge_tags and 'tag' in update_data.updates
+        params = []
+        for field in fields:
+            value = update_data.updates[field]
+            if field == 'tag' and merge_tags and not isinstance(value, list):
+                value = [value]
+            params.append(value)
+        
+        # 一条UPDATE ... RETURNING完成所有权验证与更新，不存在或不属于该用户的记录不会被更新
+        try:
+            async with self.db_pool.acquire() as conn:
+                updated_id = await conn.fetchval(
+                    _update_sql(fields, merge_tags), update_data.id, context.user_id, *params
+                )
+        except Exception:
+            return {
+                "success": False,
+                "hinata_id": update_data.id,
+                "updated_fields": list(update_data.updates.keys()),
+                "message": "Update failed"
+            }
+        
+        if updated_id is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"No permission to modify HiNATA: {update_data.id}"
             )
         
-        # 获取现有数据
-        existing_data = await self._get_hinata_by_id(update_data.id)
-        if not existing_data:
-            raise ValueError(f"HiNATA not found: {update_data.id}")
-        
-        # 应用更新
-        updated_data = existing_data.copy()
-        for field, value in update_data.updates.items():
-            if field == 'tag' and update_data.merge_tags:
-                # 合并标签
-                existing_tags = set(updated_data.get('tag', []))
-                new_tags = set(value if isinstance(value, list) else [value])
-                updated_data['tag'] = list(existing_tags.union(new_tags))
-            else:
-                updated_data[field] = value
-        
-        # 更新时间戳
-        updated_data['timestamp'] = datetime.now(timezone.utc).isoformat()
-        
-        # 保存更新
-        success = await self._update_hinata_in_storage(updated_data)
-        
         return {
-            "success": success,
+            "success": True,
             "hinata_id": update_data.id,
             "updated_fields": list(update_data.updates.keys()),
-            "message": "HiNATA updated successfully" if success else "Update failed"
+            "message": "HiNATA updated successfully"
         }
     
     async def _handle_delete_operation(self, request: HiNATAWriteRequestModel, context: WriteOperationContext) -> Dict[str, Any]:
@@ -416,15 +581,11 @@ class HiNATAWriteProcessor:
                 detail=f"No permission to delete HiNATA: {unauthorized}"
             )
         
-        deleted_count = 0
-        for hinata_id in hinata_ids:
-            if soft_delete:
-                success = await self._soft_delete_hinata(hinata_id)
-            else:
-                success = await self._hard_delete_hinata(hinata_id)
-            
-            if success:
-                deleted_count += 1
+        # 一条语句删除全部目标记录
+        if soft_delete:
+            deleted_count = await self._soft_delete_many(hinata_ids)
+        else:
+            deleted_count = await self._hard_delete_many(hinata_ids)
         
         return {
             "success": deleted_count > 0,
@@ -445,14 +606,17 @@ class HiNATAWriteProcessor:
         if not is_safe:
             raise ValueError(f"Bulk operation safety check failed: {errors}")
         
-        # 获取目标HiNATA列表
-        target_hinatas = await self._find_hinatas_by_filter(bulk_op.target_filter, context.user_id)
-        
         if bulk_op.dry_run:
+            # 只统计目标数量并取前5个作为样例，不加载全部目标记录
+            estimated_count = 0
+            async for ids in self._iter_hinata_ids(bulk_op.target_filter, context.user_id, bulk_op.batch_size):
+                estimated_count += len(ids)
             return {
                 "dry_run": True,
-                "estimated_count": len(target_hinatas),
-                "sample_targets": target_hinatas[:5],  # 返回前5个作为样例
+                "estimated_count": estimated_count,
+                "sample_targets": await self._find_hinatas_by_filter(
+                    bulk_op.target_filter, context.user_id, limit=5
+                ),
                 "batch_results": [],
                 "successful_count": 0,
                 "errors": []
@@ -461,200 +625,196 @@ class HiNATAWriteProcessor:
         # 批量处理
         batch_results = []
         successful_count = 0
+        total_processed = 0
         errors = []
         
-        # 分批处理
-        for i in range(0, len(target_hinatas), bulk_op.batch_size):
-            batch = target_hinatas[i:i + bulk_op.batch_size]
+        operation_type = bulk_op.operation_type
+        update_sql = self.BULK_TAG_SQL.get(operation_type)
+        new_tags = bulk_op.operation_data.get('tags', [])
+        tag_field = "added_tags" if operation_type == "bulk_tag" else "new_tags"
+        
+        if update_sql is None:
+            async for ids in self._iter_hinata_ids(bulk_op.target_filter, context.user_id, bulk_op.batch_size):
+                total_processed += len(ids)
+                batch_results.extend({
+                    "success": False,
+                    "hinata_id": hinata_id,
+                    "error": f"Unsupported bulk operation: {operation_type}"
+                } for hinata_id in ids)
+        else:
+            # 目标ID经服务端游标按批流入，每批一条UPDATE语句在各自的连接上并发执行，
+            # 并发数受信号量限制，为游标所占连接之外的请求留出余量
+            semaphore = asyncio.Semaphore(max(1, min(8, self.db_pool.get_max_size() - 1)))
+            batches = []
+            tasks = []
+            try:
+                async for ids in self._iter_hinata_ids(bulk_op.target_filter, context.user_id, bulk_op.batch_size):
+                    total_processed += len(ids)
+                    batches.append(ids)
+                    tasks.append(asyncio.create_task(
+                        self._execute_bulk_batch(semaphore, update_sql, ids, new_tags)
+                    ))
+            except BaseException:
+                # 游标出错或请求被取消时，取消已提交的批次并等待其结束，不留下无人等待的任务
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            batch_outcomes = await asyncio.gather(*tasks, return_exceptions=True)
             
-            for hinata in batch:
-                try:
-                    result = await self._apply_bulk_operation(hinata, bulk_op.operation_data, bulk_op.operation_type)
-                    batch_results.append(result)
-                    if result.get('success'):
-                        successful_count += 1
-                except Exception as e:
-                    errors.append(f"Failed to process {hinata['id']}: {str(e)}")
+            for ids, outcome in zip(batches, batch_outcomes):
+                if isinstance(outcome, BaseException):
+                    errors.append(f"Failed to process {ids[0]}..{ids[-1]}: {str(outcome)}")
+                    continue
+                batch_results.extend({
+                    "success": True,
+                    "hinata_id": hinata_id,
+                    "operation": operation_type,
+                    tag_field: new_tags
+                } for hinata_id in ids)
+                successful_count += len(ids)
         
         return {
             "dry_run": False,
             "batch_results": batch_results,
             "successful_count": successful_count,
-            "total_processed": len(target_hinatas),
+            "total_processed": total_processed,
             "errors": errors
         }
     
-    async def _get_hinata_by_id(self, hinata_id: str) -> Optional[Dict[str, Any]]:
-        """根据ID获取HiNATA数据"""
-        async with self.db_pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT * FROM hinata_data WHERE id = $1",
-                hinata_id
-            )
-            return dict(row) if row else None
-    
-    async def _update_hinata_in_storage(self, hinata_data: Dict[str, Any]) -> bool:
-        """在存储中更新HiNATA数据"""
-        try:
+    async def _execute_bulk_batch(self, semaphore: asyncio.Semaphore, update_sql: str,
+                                  ids: List[str], new_tags: List[str]):
+        """在独立的池连接上执行一批批量标签更新"""
+        async with semaphore:
             async with self.db_pool.acquire() as conn:
-                await conn.execute('''
-                    UPDATE hinata_data SET
-                        highlight = $2,
-                        note = $3,
-                        address = $4,
-                        tags = $5,
-                        access_level = $6,
-                        timestamp = $7
-                    WHERE id = $1
-                ''',
-                    hinata_data['id'],
-                    hinata_data['highlight'],
-                    hinata_data['note'],
-                    hinata_data['address'],
-                    json.dumps(hinata_data['tag']),
-                    hinata_data['access'],
-                    hinata_data['timestamp']
-                )
-            return True
-        except Exception:
-            return False
+                await conn.execute(update_sql, ids, new_tags)
     
-    async def _soft_delete_hinata(self, hinata_id: str) -> bool:
-        """软删除HiNATA"""
+    async def _soft_delete_many(self, hinata_ids: List[str]) -> int:
+        """软删除多个HiNATA，返回实际删除的数量"""
         try:
             async with self.db_pool.acquire() as conn:
-                await conn.execute(
-                    "UPDATE hinata_data SET is_deleted = TRUE, deleted_at = NOW() WHERE id = $1",
-                    hinata_id
+                command_tag = await conn.execute(
+                    "UPDATE hinata_data SET is_deleted = TRUE, deleted_at = NOW() "
+                    "WHERE id = ANY($1::text[]) AND is_deleted = FALSE",
+                    hinata_ids
                 )
-            return True
+            return int(command_tag.rsplit(' ', 1)[-1])
         except Exception:
-            return False
+            return 0
     
-    async def _hard_delete_hinata(self, hinata_id: str) -> bool:
-        """硬删除HiNATA"""
+    async def _hard_delete_many(self, hinata_ids: List[str]) -> int:
+        """硬删除多个HiNATA，返回实际删除的数量"""
         try:
             async with self.db_pool.acquire() as conn:
-                await conn.execute("DELETE FROM hinata_data WHERE id = $1", hinata_id)
-            return True
+                command_tag = await conn.execute(
+                    "DELETE FROM hinata_data WHERE id = ANY($1::text[])", hinata_ids
+                )
+            return int(command_tag.rsplit(' ', 1)[-1])
         except Exception:
-            return False
+            return 0
     
-    async def _find_hinatas_by_filter(self, filter_conditions: Dict[str, Any], user_id: str) -> List[Dict[str, Any]]:
+    async def _find_hinatas_by_filter(self, filter_conditions: Dict[str, Any], user_id: str,
+                                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """根据过滤条件查找HiNATA"""
+        shape, params = _filter_shape(filter_conditions, with_date_range=True)
+        query = _filter_sql(self.SAMPLE_QUERY, shape)
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
         async with self.db_pool.acquire() as conn:
-            query = "SELECT * FROM hinata_data WHERE user_id = $1 AND is_deleted = FALSE"
-            params = [user_id]
-            
-            # 构建动态查询条件
-            if 'tag' in filter_conditions:
-                query += f" AND tags::jsonb ? ${len(params) + 1}"
-                params.append(filter_conditions['tag'])
-            
-            if 'source' in filter_conditions:
-                query += f" AND source = ${len(params) + 1}"
-                params.append(filter_conditions['source'])
-            
-            if 'date_range' in filter_conditions:
-                date_range = filter_conditions['date_range']
-                if 'start' in date_range:
-                    query += f" AND timestamp >= ${len(params) + 1}"
-                    params.append(date_range['start'])
-                if 'end' in date_range:
-                    query += f" AND timestamp <= ${len(params) + 1}"
-                    params.append(date_range['end'])
-            
-            rows = await conn.fetch(query, *params)
+            rows = await conn.fetch(query, user_id, *params)
             return [dict(row) for row in rows]
     
-    async def _apply_bulk_operation(self, hinata: Dict[str, Any], operation_data: Dict[str, Any], operation_type: str) -> Dict[str, Any]:
-        """应用批量操作到单个HiNATA"""
-        try:
-            if operation_type == "bulk_tag":
-                # 批量添加标签
-                new_tags = operation_data.get('tags', [])
-                existing_tags = json.loads(hinata.get('tags', '[]'))
-                combined_tags = list(set(existing_tags + new_tags))
-                
-                async with self.db_pool.acquire() as conn:
-                    await conn.execute(
-                        "UPDATE hinata_data SET tags = $2 WHERE id = $1",
-                        hinata['id'], json.dumps(combined_tags)
-                    )
-                
-                return {
-                    "success": True,
-                    "hinata_id": hinata['id'],
-                    "operation": "bulk_tag",
-                    "added_tags": new_tags
-                }
-            
-            elif operation_type == "bulk_retag":
-                # 批量重新标记
-                new_tags = operation_data.get('tags', [])
-                
-                async with self.db_pool.acquire() as conn:
-                    await conn.execute(
-                        "UPDATE hinata_data SET tags = $2 WHERE id = $1",
-                        hinata['id'], json.dumps(new_tags)
-                    )
-                
-                return {
-                    "success": True,
-                    "hinata_id": hinata['id'],
-                    "operation": "bulk_retag",
-                    "new_tags": new_tags
-                }
-            
-            else:
-                return {
-                    "success": False,
-                    "hinata_id": hinata['id'],
-                    "error": f"Unsupported bulk operation: {operation_type}"
-                }
-                
-        except Exception as e:
-            return {
-                "success": False,
-                "hinata_id": hinata['id'],
-                "error": str(e)
-            }
+    async def _iter_hinata_ids(self, filter_conditions: Dict[str, Any], user_id: str,
+                               batch_size: int) -> AsyncIterator[List[str]]:
+        """通过服务端游标按批产出匹配的HiNATA ID，只投影id列"""
+        shape, params = _filter_shape(filter_conditions, with_date_range=True)
+        query = _filter_sql("SELECT id FROM hinata_data WHERE user_id = $1 AND is_deleted = FALSE", shape)
+        async with self.db_pool.acquire() as conn:
+            # asyncpg游标必须在事务内使用
+            async with conn.transaction():
+                batch = []
+                async for record in conn.cursor(query, user_id, *params, prefetch=batch_size,
+                                                timeout=self.long_command_timeout):
+                    batch.append(record['id'])
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
     
-    async def _create_backup(self, user_id: str, operation_id: str):
-        """创建操作前备份"""
-        backup_key = f"backup:{user_id}:{operation_id}"
-        
-        # 获取用户所有HiNATA数据
+    async def _snapshot_user_data(self, user_id: str, operation_id: str) -> str:
+        """取得用户全部HiNATA数据的操作前快照：由Postgres直接聚合为JSON文本，不在Python中逐行构建字典"""
         async with self.db_pool.acquire() as conn:
-            rows = await conn.fetch(
-                "SELECT * FROM hinata_data WHERE user_id = $1 AND is_deleted = FALSE",
-                user_id
-            )
-            
-            backup_data = {
-                "user_id": user_id,
-                "operation_id": operation_id,
-                "backup_time": datetime.now(timezone.utc).isoformat(),
-                "data": [dict(row) for row in rows]
-            }
-            
-            # 存储到Redis，保留24小时
-            await self.redis_pool.setex(
-                backup_key,
-                24 * 3600,
-                json.dumps(backup_data, default=str)
-            )
+            return await conn.fetchval('''
+                SELECT json_build_object(
+                    'user_id', $1::text,
+                    'operation_id', $2::text,
+                    'backup_time', NOW(),
+                    'data', COALESCE(json_agg(h), '[]'::json)
+                )::text
+                FROM hinata_data h
+                WHERE h.user_id = $1 AND h.is_deleted = FALSE
+            ''', user_id, operation_id, timeout=self.long_command_timeout)
+    
+    async def _store_backup(self, user_id: str, operation_id: str, backup_json: str):
+        """压缩快照后存储到Redis，保留24小时"""
+        compressed = await asyncio.to_thread(zlib.compress, backup_json.encode())
+        await self.redis_pool.setex(f"backup:{user_id}:{operation_id}", 24 * 3600, compressed)
+    
+    def _on_backup_done(self, task: asyncio.Task):
+        """备份写入任务结束：释放引用，记录失败原因"""
+        self._pending_backups.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._logger.error("Failed to store pre-write backup", exc_info=task.exception())
+    
+    async def wait_for_backups(self):
+        """等待所有进行中的备份写入完成"""
+        if self._pending_backups:
+            await asyncio.gather(*self._pending_backups, return_exceptions=True)
 
 
 class HiNATAWriteAPI:
     """HiNATA写入API主类"""
     
+    # 写入日志表的列顺序，与_log_write_operation追加的记录一致
+    WRITE_LOG_COLUMNS = (
+        'operation_id', 'user_id', 'operation_type', 'intent_description',
+        'affected_count', 'processing_time', 'status'
+    )
+    # 缓冲的日志记录达到该数量时立即刷新，不等待定时周期
+    WRITE_LOG_FLUSH_SIZE = 500
+    # 数据库持续不可用时缓冲最多保留的日志记录数，超出部分丢弃最旧的记录
+    WRITE_LOG_BUFFER_LIMIT = 50000
+    # 建表咨询锁的键，同一数据库上的所有写入API worker共用
+    SCHEMA_LOCK_KEY = 0x48694E415441
+    # 建索引咨询锁的键，只有拿到锁的worker在后台建索引，其余worker直接跳过
+    INDEX_LOCK_KEY = 0x48694E415442
+    # 写入日志表的索引：名称 -> 建索引语句。历史查询的覆盖索引按用户、时间倒序只扫描索引即可取回返回列
+    WRITE_LOG_INDEXES = {
+        'idx_hinata_write_logs_user_created': (
+            'CREATE INDEX CONCURRENTLY idx_hinata_write_logs_user_created '
+            'ON hinata_write_logs (user_id, created_at DESC) '
+            'INCLUDE (operation_id, operation_type, intent_description, affected_count, status)'
+        ),
+        'idx_hinata_write_logs_operation_id': (
+            'CREATE INDEX CONCURRENTLY idx_hinata_write_logs_operation_id '
+            'ON hinata_write_logs (operation_id)'
+        ),
+    }
+    # 查询已存在的索引及其是否有效；CONCURRENTLY建索引失败会留下无效索引
+    INDEX_STATE_SQL = """
+        SELECT c.relname, i.indisvalid
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = ANY($1::text[])
+    """
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.app = FastAPI(
             title="ByenatOS HiNATA Write API",
             description="ByenatOS HiNATA文件系统写入API",
-            version="1.0.0"
+            version="1.0.0",
+            default_response_class=ORJSONResponse
         )
         
         # 初始化组件
@@ -662,6 +822,14 @@ class HiNATAWriteAPI:
         self.write_processor = None
         self.hinata_processor = None
         self.storage_engine = None
+        # 待写入的操作日志记录及其后台刷新任务
+        self._pending_logs: List[Tuple] = []
+        self._log_flush_event = asyncio.Event()
+        self._log_flush_stopping = False
+        self._log_flush_task = None
+        self._index_build_task = None
+        self._last_active_task = None
+        self._logger = logging.getLogger(__name__)
         
         # 设置路由
         self._setup_routes()
@@ -669,11 +837,29 @@ class HiNATAWriteAPI:
     async def initialize(self):
         """初始化API服务"""
         # 初始化数据库连接
-        db_pool = await asyncpg.create_pool(self.config['postgres_dsn'])
+        # 过滤查询按形状生成固定SQL，预编译语句缓存不过期，每种形状在每个连接上只准备一次；
+        # 连接池大小按连接预算在各worker间分摊，启动时建立min_size个连接（各自完成init回调）；
+        # command_timeout只针对短小的OLTP写入语句，快照、批量游标、日志COPY和建表锁等待显式使用更长的超时；
+        # 关闭JIT，服务端TCP保活及早发现失效连接
+        min_size, max_size = worker_pool_limits(self.config)
+        db_pool = await asyncpg.create_pool(
+            self.config['postgres_dsn'],
+            min_size=min_size,
+            max_size=max_size,
+            max_inactive_connection_lifetime=300,
+            command_timeout=self.config.get('db_command_timeout', 10),
+            server_settings={'jit': 'off', 'tcp_keepalives_idle': '60'},
+            statement_cache_size=1024,
+            max_cached_statement_lifetime=0,
+            connection_class=WriteAPIConnection,
+            init=WriteAPIConnection.setup
+        )
         redis_pool = aioredis.from_url(self.config['redis_url'])
         
         # 初始化组件
         self.auth_manager = AuthManager(db_pool, redis_pool)
+        # 认证时只在内存中记录App最近活跃时间，由后台任务定期写回
+        self._last_active_task = asyncio.create_task(self.auth_manager.flush_last_active())
         
         self.hinata_processor = HiNATAProcessor(
             self.config['redis_url'],
@@ -685,48 +871,83 @@ class HiNATAWriteAPI:
         await self.storage_engine.initialize()
         
         self.write_processor = HiNATAWriteProcessor(
-            db_pool, redis_pool, self.hinata_processor, self.storage_engine
+            db_pool, redis_pool, self.hinata_processor, self.storage_engine,
+            long_command_timeout=self.config.get('db_long_command_timeout', 300)
         )
         
         # 创建数据库表
         await self._create_tables(db_pool)
+        # 建索引可能耗时较长且要等待已有事务结束，放到后台执行，不阻塞启动
+        self._index_build_task = asyncio.create_task(self._ensure_indexes(db_pool))
+        
+        self._log_flush_task = asyncio.create_task(self.flush_write_logs())
     
     async def _create_tables(self, db_pool):
-        """创建写入API相关数据库表"""
+        """创建写入API相关数据库表：多个worker同时启动时，由会话级咨询锁串行执行建表"""
+        # 等待其他worker建表以及DDL等待表锁的时间都可能超过command_timeout
+        schema_timeout = self.config.get('db_long_command_timeout', 300)
         async with db_pool.acquire() as conn:
-            # 用户权限表
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS user_permissions (
-                    user_id TEXT PRIMARY KEY,
-                    write_permissions JSONB NOT NULL DEFAULT '[]',
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-                )
-            ''')
-            
-            # 写入操作日志表
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS hinata_write_logs (
-                    id SERIAL PRIMARY KEY,
-                    operation_id TEXT NOT NULL,
-                    user_id TEXT NOT NULL,
-                    operation_type TEXT NOT NULL,
-                    intent_description TEXT,
-                    affected_count INTEGER DEFAULT 0,
-                    processing_time REAL DEFAULT 0,
-                    status TEXT NOT NULL,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                    INDEX (user_id, created_at DESC),
-                    INDEX (operation_id)
-                )
-            ''')
-            
-            # 为hinata_data表添加删除相关字段
-            await conn.execute('''
-                ALTER TABLE hinata_data 
-                ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE,
-                ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE
-            ''')
+            await conn.execute("SELECT pg_advisory_lock($1)", self.SCHEMA_LOCK_KEY, timeout=schema_timeout)
+            try:
+                await self._apply_schema(conn, schema_timeout)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", self.SCHEMA_LOCK_KEY)
+    
+    async def _apply_schema(self, conn, timeout: float):
+        """在持有建表锁的连接上执行建表语句"""
+        # 用户权限表
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_permissions (
+                user_id TEXT PRIMARY KEY,
+                write_permissions JSONB NOT NULL DEFAULT '[]',
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        ''', timeout=timeout)
+        
+        # 写入操作日志表
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS hinata_write_logs (
+                id SERIAL PRIMARY KEY,
+                operation_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                operation_type TEXT NOT NULL,
+                intent_description TEXT,
+                affected_count INTEGER DEFAULT 0,
+                processing_time REAL DEFAULT 0,
+                status TEXT NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        ''', timeout=timeout)
+        
+        # 为hinata_data表添加删除相关字段
+        await conn.execute('''
+            ALTER TABLE hinata_data 
+            ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE,
+            ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE
+        ''', timeout=timeout)
+    
+    async def _ensure_indexes(self, db_pool):
+        """补建缺失的写入日志索引，并重建CONCURRENTLY失败后留下的无效索引"""
+        try:
+            async with db_pool.acquire() as conn:
+                if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", self.INDEX_LOCK_KEY):
+                    return
+                try:
+                    rows = await conn.fetch(self.INDEX_STATE_SQL, list(self.WRITE_LOG_INDEXES))
+                    # CONCURRENTLY需等待已有事务结束，不受写入语句的command_timeout限制
+                    build_timeout = self.config.get('index_build_timeout', 3600)
+                    valid = {row['relname']: row['indisvalid'] for row in rows}
+                    for name, ddl in self.WRITE_LOG_INDEXES.items():
+                        if valid.get(name):
+                            continue
+                        if name in valid:
+                            await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}', timeout=build_timeout)
+                        await conn.execute(ddl, timeout=build_timeout)
+                finally:
+                    await conn.execute("SELECT pg_advisory_unlock($1)", self.INDEX_LOCK_KEY)
+        except Exception:
+            self._logger.exception("Failed to build write log indexes")
     
     def _setup_routes(self):
         """设置API路由"""
@@ -751,7 +972,7 @@ class HiNATAWriteAPI:
             """写入/修改HiNATA数据"""
             
             # 检查权限
-            if HiNATAWritePermission.HINATA_WRITE.value not in [p.value for p in app.permissions]:
+            if _PERM_WRITE not in app.permission_values:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="HiNATA write permission required"
@@ -760,18 +981,18 @@ class HiNATAWriteAPI:
             # 创建操作上下文
             context = WriteOperationContext(
                 user_id=request.user_id,
-                operation_id=f"write_{int(time.time())}_{uuid.uuid4().hex[:8]}",
+                operation_id=_make_operation_id("write"),
                 operation_type=HiNATAWriteOperation(request.operation_type),
                 intent_description=request.intent_description,
                 source_app=app.app_id,
-                timestamp=datetime.now(timezone.utc).isoformat()
+                timestamp=utc_now_iso()
             )
             
             # 处理写入请求
             response = await self.write_processor.process_write_request(request, context)
             
             # 记录操作日志
-            await self._log_write_operation(context, response)
+            self._log_write_operation(context, response)
             
             return response
         
@@ -784,7 +1005,7 @@ class HiNATAWriteAPI:
             """删除HiNATA数据"""
             
             # 检查权限
-            if HiNATAWritePermission.HINATA_DELETE.value not in [p.value for p in app.permissions]:
+            if _PERM_DELETE not in app.permission_values:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="HiNATA delete permission required"
@@ -803,15 +1024,15 @@ class HiNATAWriteAPI:
             
             context = WriteOperationContext(
                 user_id=request.user_id,
-                operation_id=f"delete_{int(time.time())}_{uuid.uuid4().hex[:8]}",
+                operation_id=_make_operation_id("delete"),
                 operation_type=HiNATAWriteOperation.DELETE,
                 intent_description=write_request.intent_description,
                 source_app=app.app_id,
-                timestamp=datetime.now(timezone.utc).isoformat()
+                timestamp=utc_now_iso()
             )
             
             response = await self.write_processor.process_write_request(write_request, context)
-            await self._log_write_operation(context, response)
+            self._log_write_operation(context, response)
             
             return response
         
@@ -824,7 +1045,7 @@ class HiNATAWriteAPI:
             """批量操作HiNATA数据"""
             
             # 检查权限
-            if HiNATAWritePermission.HINATA_BULK_MODIFY.value not in [p.value for p in app.permissions]:
+            if _PERM_BULK_MODIFY not in app.permission_values:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="HiNATA bulk modify permission required"
@@ -832,15 +1053,15 @@ class HiNATAWriteAPI:
             
             context = WriteOperationContext(
                 user_id=request.user_id,
-                operation_id=f"bulk_{int(time.time())}_{uuid.uuid4().hex[:8]}",
+                operation_id=_make_operation_id("bulk"),
                 operation_type=HiNATAWriteOperation(request.operation_type),
                 intent_description=request.intent_description,
                 source_app=app.app_id,
-                timestamp=datetime.now(timezone.utc).isoformat()
+                timestamp=utc_now_iso()
             )
             
             write_response = await self.write_processor.process_write_request(request, context)
-            await self._log_write_operation(context, write_response)
+            self._log_write_operation(context, write_response)
             
             # 转换为批量操作响应格式
             return BulkOperationResponse(
@@ -864,19 +1085,13 @@ class HiNATAWriteAPI:
             """获取写入操作历史"""
             
             async with self.write_processor.db_pool.acquire() as conn:
-                rows = await conn.fetch('''
-                    SELECT operation_id, operation_type, intent_description, 
-                           affected_count, status, created_at
-                    FROM hinata_write_logs 
-                    WHERE user_id = $1 
-                    ORDER BY created_at DESC 
-                    LIMIT $2
-                ''', user_id, limit)
-                
-                return {
-                    "user_id": user_id,
-                    "operations": [dict(row) for row in rows]
-                }
+                history_stmt = await conn.history_statement()
+                operations = await history_stmt.fetchval(user_id, limit)
+            
+            return Response(
+                content=b'{"user_id":' + orjson.dumps(user_id) + b',"operations":' + operations.encode() + b'}',
+                media_type="application/json"
+            )
         
         # 5. 备份恢复接口
         @self.app.post("/api/hinata/restore")
@@ -888,7 +1103,7 @@ class HiNATAWriteAPI:
             """从备份恢复数据"""
             
             # 检查管理员权限
-            if HiNATAWritePermission.HINATA_ADMIN.value not in [p.value for p in app.permissions]:
+            if _PERM_ADMIN not in app.permission_values:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="HiNATA admin permission required"
@@ -909,19 +1124,65 @@ class HiNATAWriteAPI:
                 "message": f"Restore operation initiated for {operation_id}"
             }
     
-    async def _log_write_operation(self, context: WriteOperationContext, response: HiNATAWriteResponse):
-        """记录写入操作日志"""
-        async with self.write_processor.db_pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO hinata_write_logs 
-                (operation_id, user_id, operation_type, intent_description, 
-                 affected_count, processing_time, status)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-            ''',
-                context.operation_id, context.user_id, context.operation_type.value,
-                context.intent_description, response.affected_count,
-                response.processing_time, response.status
-            )
+    def _log_write_operation(self, context: WriteOperationContext, response: HiNATAWriteResponse):
+        """记录写入操作日志：追加到内存缓冲，由后台任务批量写入数据库"""
+        self._pending_logs.append((
+            context.operation_id, context.user_id, context.operation_type.value,
+            context.intent_description, response.affected_count,
+            response.processing_time, response.status
+        ))
+        if len(self._pending_logs) >= self.WRITE_LOG_FLUSH_SIZE:
+            self._log_flush_event.set()
+    
+    async def flush_write_logs(self, interval: float = 1.0):
+        """定期（或缓冲达到WRITE_LOG_FLUSH_SIZE时）把缓冲的写入日志用一次COPY写入，请求路径上不等待日志落盘"""
+        while not self._log_flush_stopping:
+            try:
+                await asyncio.wait_for(self._log_flush_event.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._log_flush_event.clear()
+            await self._flush_pending_logs()
+    
+    async def _flush_pending_logs(self):
+        """把当前缓冲的写入日志COPY到数据库"""
+        if not self._pending_logs:
+            return
+        
+        pending, self._pending_logs = self._pending_logs, []
+        try:
+            async with self.write_processor.db_pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    'hinata_write_logs', records=pending, columns=self.WRITE_LOG_COLUMNS,
+                    timeout=self.write_processor.long_command_timeout
+                )
+        except Exception:
+            # 写入失败时放回缓冲，下一轮重试；缓冲超过上限时丢弃最旧的记录，避免内存无限增长
+            self._logger.warning("Failed to flush %d write log records", len(pending), exc_info=True)
+            self._pending_logs[:0] = pending
+            overflow = len(self._pending_logs) - self.WRITE_LOG_BUFFER_LIMIT
+            if overflow > 0:
+                del self._pending_logs[:overflow]
+                self._logger.error("Write log buffer full, dropped %d oldest records", overflow)
+    
+    async def close(self):
+        """停止后台任务，写入剩余日志后关闭连接"""
+        # 刷新任务可能正在COPY，取消会丢失这一批日志；通知其退出循环并等待当前批次完成
+        if self._log_flush_task:
+            self._log_flush_stopping = True
+            self._log_flush_event.set()
+            await self._log_flush_task
+        if self._index_build_task:
+            self._index_build_task.cancel()
+        # 最近活跃时间只是近似值，关闭时最多丢失一个写回周期内的更新
+        if self._last_active_task:
+            self._last_active_task.cancel()
+        
+        if self.write_processor:
+            await self._flush_pending_logs()
+            await self.write_processor.wait_for_backups()
+            await self.write_processor.db_pool.close()
+            await self.write_processor.redis_pool.close()
     
     def get_app(self) -> FastAPI:
         """获取FastAPI应用实例"""
@@ -942,16 +1203,34 @@ async def create_write_api() -> FastAPI:
     api = HiNATAWriteAPI(config)
     await api.initialize()
     
-    return api.get_app()
+    app = api.get_app()
+    # 进程退出时写入缓冲的日志、等待备份任务并关闭连接池
+    app.add_event_handler("shutdown", api.close)
+    return app
 
 
 if __name__ == "__main__":
+    import os
+    import sys
     import uvicorn
     
+    # 传入--reload时为开发模式（单进程热重载、输出访问日志）；
+    # 否则按生产配置启动：多worker、uvloop事件循环、httptools解析器、关闭访问日志
+    dev_mode = "--reload" in sys.argv[1:]
+    workers = 1 if dev_mode else max(2, (os.cpu_count() or 2) // 2)
+    # worker数经环境变量传给各worker进程，用于按worker分摊数据库连接预算
+    os.environ["WEB_CONCURRENCY"] = str(workers)
     uvicorn.run(
         "InterfaceAbstraction.APIs.HiNATAWriteAPI:create_write_api",
         host="0.0.0.0",
         port=8081,
-        reload=True,
-        factory=True
-    )
\ No newline at end of file
+        factory=True,
+        reload=dev_mode,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        timeout_keep_alive=30,
+        limit_concurrency=1000,
+        access_log=dev_mode
+    )
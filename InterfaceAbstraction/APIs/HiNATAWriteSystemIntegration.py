@@ -7,14 +7,32 @@ HiNATA写入系统集成模块 - 整合所有写入相关组件
 """
 
 import asyncio
-import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
 
+import orjson
+
 from InterfaceAbstraction.APIs.HiNATAWriteAPI import HiNATAWriteAPI
 from InterfaceAbstraction.APIs.ConversationalWriteInterface import ConversationalWriteInterface
 from InterfaceAbstraction.APIs.IntentRecognizer import IntentRecognizer
-from Security.WritePermissionManager import WritePermissionManager
+from Security.WritePermissionManager import PermissionDenyReason, WritePermissionManager
+
+
+# 权限不足时给用户的处理建议
+_PERMISSION_HELP: Dict[PermissionDenyReason, str] = {
+    PermissionDenyReason.NO_WRITE: "请联系管理员申请写入权限",
+    PermissionDenyReason.READ_ONLY: "您当前只有只读权限，需要申请写入权限",
+    PermissionDenyReason.DAILY_LIMIT_EXCEEDED: "您今日的操作次数已达上限，请明天再试",
+    PermissionDenyReason.BATCH_SIZE_EXCEEDED: "批次大小超出限制，请减少操作范围或申请更高权限",
+    PermissionDenyReason.ADMIN_REQUIRED: "此操作需要管理员权限",
+    PermissionDenyReason.TWO_FACTOR_REQUIRED: "请启用两因子认证后重试"
+}
+_DEFAULT_PERMISSION_HELP = "请检查您的权限设置或联系管理员"
 
 
 class HiNATAWriteSystemIntegration:
@@ -31,32 +49,33 @@ class HiNATAWriteSystemIntegration:
         
         # 系统状态
         self.initialized = False
+        self._logger = logging.getLogger(__name__)
     
     async def initialize(self):
         """初始化整个写入系统"""
-        print("正在初始化HiNATA写入系统...")
+        self._logger.info("正在初始化HiNATA写入系统...")
         
         # 1. 初始化权限管理器
-        print("- 初始化权限管理器")
+        self._logger.info("- 初始化权限管理器")
         self.permission_manager = WritePermissionManager(self.config)
         await self.permission_manager.initialize()
         
         # 2. 初始化意图识别器
-        print("- 初始化意图识别器")
+        self._logger.info("- 初始化意图识别器")
         self.intent_recognizer = IntentRecognizer()
         
         # 3. 初始化写入API
-        print("- 初始化写入API")
+        self._logger.info("- 初始化写入API")
         self.write_api = HiNATAWriteAPI(self.config)
         await self.write_api.initialize()
         
         # 4. 初始化对话接口
-        print("- 初始化对话接口")
+        self._logger.info("- 初始化对话接口")
         self.conversation_interface = ConversationalWriteInterface(self.config)
         await self.conversation_interface.initialize()
         
         self.initialized = True
-        print("HiNATA写入系统初始化完成!")
+        self._logger.info("HiNATA写入系统初始化完成!")
     
     async def process_user_request(self, user_id: str, user_input: str, 
                                  context: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -66,11 +85,11 @@ class HiNATAWriteSystemIntegration:
             raise RuntimeError("系统未初始化")
         
         context = context or {}
-        start_time = datetime.now(timezone.utc)
+        start_time = time.perf_counter()
         
         try:
             # 1. 意图识别
-            print(f"处理用户请求: {user_input}")
+            self._logger.info("处理用户请求: %s", user_input)
             recognized_intent = self.intent_recognizer.recognize_intent(user_input, context)
             
             if recognized_intent.confidence < 0.3:
@@ -84,7 +103,10 @@ class HiNATAWriteSystemIntegration:
                     ]
                 }
             
-            print(f"识别的意图: {recognized_intent.intent_type.value} (置信度: {recognized_intent.confidence:.2f})")
+            self._logger.info(
+                "识别的意图: %s (置信度: %.2f)",
+                recognized_intent.intent_type.value, recognized_intent.confidence
+            )
             
             # 2. 权限验证
             operation_data = {
@@ -107,12 +129,12 @@ class HiNATAWriteSystemIntegration:
             if not allowed:
                 return {
                     "status": "permission_denied",
-                    "message": f"权限不足: {reason}",
+                    "message": f"权限不足: {reason.value}",
                     "audit_id": audit_id,
-                    "required_action": self._get_permission_help(reason)
+                    "required_action": _PERMISSION_HELP.get(reason, _DEFAULT_PERMISSION_HELP)
                 }
             
-            print(f"权限验证通过 (审计ID: {audit_id})")
+            self._logger.info("权限验证通过 (审计ID: %s)", audit_id)
             
             # 3. 执行试运行
             dry_run_result = await self._execute_dry_run(user_id, recognized_intent)
@@ -130,7 +152,7 @@ class HiNATAWriteSystemIntegration:
                 }
             
             # 4. 返回预览结果和确认请求
-            processing_time = (datetime.now(timezone.utc) - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             return {
                 "status": "preview_ready",
@@ -151,7 +173,7 @@ class HiNATAWriteSystemIntegration:
             }
             
         except Exception as e:
-            processing_time = (datetime.now(timezone.utc) - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             return {
                 "status": "error",
                 "message": f"处理请求时发生错误: {str(e)}",
@@ -167,19 +189,15 @@ class HiNATAWriteSystemIntegration:
             raise RuntimeError("系统未初始化")
         
         try:
-            # 从审计日志获取操作详情
-            audit_logs = await self.permission_manager.get_audit_logs(
-                user_id=user_id, limit=1, offset=0
-            )
+            # 按审计ID获取操作详情（不受该用户期间其他操作的影响）
+            audit_log = await self.permission_manager.get_audit_log(audit_id)
             
-            if not audit_logs or audit_logs[0]["log_id"] != audit_id:
+            if not audit_log or audit_log["user_id"] != user_id:
                 return {
                     "status": "audit_not_found",
                     "message": "未找到对应的审计记录或记录已过期"
                 }
             
-            audit_log = audit_logs[0]
-            
             if not audit_log["permission_check_result"]:
                 return {
                     "status": "permission_revoked",
@@ -187,7 +205,7 @@ class HiNATAWriteSystemIntegration:
                 }
             
             # 重新构建操作请求
-            operation_details = json.loads(audit_log["operation_details"])
+            operation_details = orjson.loads(audit_log["operation_details"])
             
             # 这里应该根据audit_log重建完整的写入请求
             # 为了简化，我们返回一个模拟的执行结果
@@ -302,40 +320,45 @@ class HiNATAWriteSystemIntegration:
         """更新审计日志的执行结果"""
         
         # 这里应该更新数据库中的审计日志
-        # 为了简化，我们只是打印日志
-        print(f"更新审计日志 {audit_id}: {execution_result}")
-    
-    def _get_permission_help(self, reason: str) -> str:
-        """获取权限帮助信息"""
-        
-        help_messages = {
-            "No write permissions": "请联系管理员申请写入权限",
-            "Read-only access": "您当前只有只读权限，需要申请写入权限",
-            "Daily operation limit exceeded": "您今日的操作次数已达上限，请明天再试",
-            "Batch size limit exceeded": "批次大小超出限制，请减少操作范围或申请更高权限",
-            "Admin permissions required": "此操作需要管理员权限",
-            "Two-factor authentication required": "请启用两因子认证后重试"
-        }
-        
-        return help_messages.get(reason, "请检查您的权限设置或联系管理员")
+        # 为了简化，我们只是记录日志
+        self._logger.info("更新审计日志 %s: %s", audit_id, execution_result)
     
     async def close(self):
         """关闭系统"""
-        print("正在关闭HiNATA写入系统...")
+        self._logger.info("正在关闭HiNATA写入系统...")
         
         if self.permission_manager:
             await self.permission_manager.close()
         
         if self.write_api:
-            # 这里应该有close方法
-            pass
+            await self.write_api.close()
         
-        print("系统已关闭")
+        self._logger.info("系统已关闭")
+
+
+def _format_json(obj: Any) -> str:
+    """以缩进格式输出结果，datetime等类型由orjson直接序列化"""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC, default=str).decode()
+
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """配置写入系统日志：格式化和输出交给后台线程，不阻塞事件循环；调用方退出前需调用listener.stop()"""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, logging.StreamHandler(sys.stdout), respect_handler_level=True
+    )
+    logger = logging.getLogger(__name__)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+    listener.start()
+    return listener
 
 
 # 使用示例
 async def main():
     """使用示例"""
+    listener = setup_logging()
     
     # 系统配置
     config = {
@@ -357,7 +380,7 @@ async def main():
         
         print("\n=== 处理用户请求 ===")
         result = await write_system.process_user_request(user_id, user_input)
-        print(f"处理结果: {json.dumps(result, indent=2, ensure_ascii=False)}")
+        print(f"处理结果: {_format_json(result)}")
         
         # 如果有审计ID，模拟执行确认的操作
         if result.get("status") == "preview_ready":
@@ -365,20 +388,21 @@ async def main():
             print(f"\n=== 执行确认的操作 (审计ID: {audit_id}) ===")
             
             execution_result = await write_system.execute_confirmed_operation(user_id, audit_id)
-            print(f"执行结果: {json.dumps(execution_result, indent=2, ensure_ascii=False)}")
+            print(f"执行结果: {_format_json(execution_result)}")
         
         # 获取操作历史
         print(f"\n=== 获取用户操作历史 ===")
         history = await write_system.get_user_operation_history(user_id)
-        print(f"操作历史: {json.dumps(history, indent=2, ensure_ascii=False)}")
+        print(f"操作历史: {_format_json(history)}")
         
         # 获取系统状态
         print(f"\n=== 系统状态 ===")
         status = await write_system.get_system_status()
-        print(f"系统状态: {json.dumps(status, indent=2, ensure_ascii=False)}")
+        print(f"系统状态: {_format_json(status)}")
         
     finally:
         await write_system.close()
+        listener.stop()
 
 
 if __name__ == "__main__":
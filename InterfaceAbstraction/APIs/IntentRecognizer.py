@@ -8,9 +8,10 @@ ByenatOS Intent Recognition for HiNATA Write Operations
 
 import re
 import json
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
+import ahocorasick
 import spacy
 from datetime import datetime, timezone
 
@@ -46,10 +47,50 @@ class RecognizedIntent:
 class IntentRecognizer:
     """意图识别器"""
     
+    # 同义词归一化：按组合并为一条正则，组序号对应替换词
+    _SYNONYMS = (
+        (r'notes?|annotations?', 'hinata'),
+        (r'remove|delete|get rid of', 'delete'),
+        (r'modify|change|edit|update', 'update'),
+        (r'add|create|make', 'create'),
+        (r'tag|label|categorize', 'tag'),
+        (r'all my|my entire|everything', 'all'),
+        (r'about|regarding|related to', 'about')
+    )
+    
+    # 关键短语 (前词, 后词, 意图)：等价于正则 "前词.*后词"
+    _PHRASE_PATTERNS = (
+        ('add', 'tag', IntentType.BULK_TAG),
+        ('retag', 'all', IntentType.BULK_RETAG),
+        ('delete', 'all', IntentType.DELETE_HINATA),
+        ('clean', 'up', IntentType.CLEANUP),
+        ('merge', 'duplicate', IntentType.MERGE_DUPLICATE),
+        ('organize', 'by', IntentType.REORGANIZE),
+        ('update', 'note', IntentType.UPDATE_HINATA),
+        ('create', 'new', IntentType.CREATE_HINATA)
+    )
+    
+    # 上下文评分用到的单独关键词
+    _CONTEXT_KEYWORDS = ('all', 'duplicate', 'same')
+    
     def __init__(self):
         self.nlp = spacy.load("en_core_web_sm")
         self.intent_patterns = self._load_intent_patterns()
         self.action_keywords = self._load_action_keywords()
+        
+        self._synonym_pattern = re.compile(
+            '|'.join(rf'\b({pattern})\b' for pattern, _ in self._SYNONYMS)
+        )
+        self._synonym_replacements = tuple(replacement for _, replacement in self._SYNONYMS)
+        
+        # 所有关键短语词一次性构建为Aho-Corasick自动机，单次扫描即可完成匹配
+        self._phrase_ac = ahocorasick.Automaton()
+        for first, second, _ in self._PHRASE_PATTERNS:
+            self._phrase_ac.add_word(first, first)
+            self._phrase_ac.add_word(second, second)
+        for keyword in self._CONTEXT_KEYWORDS:
+            self._phrase_ac.add_word(keyword, keyword)
+        self._phrase_ac.make_automaton()
     
     def recognize_intent(self, user_input: str, user_context: Dict[str, Any] = None) -> RecognizedIntent:
         """识别用户意图"""
@@ -88,21 +129,11 @@ class IntentRecognizer:
         # 转小写
         normalized = user_input.lower()
         
-        # 替换常见的同义词
-        synonyms = {
-            r'\b(notes?|annotations?)\b': 'hinata',
-            r'\b(remove|delete|get rid of)\b': 'delete',
-            r'\b(modify|change|edit|update)\b': 'update',
-            r'\b(add|create|make)\b': 'create',
-            r'\b(tag|label|categorize)\b': 'tag',
-            r'\b(all my|my entire|everything)\b': 'all',
-            r'\b(about|regarding|related to)\b': 'about'
-        }
-        
-        for pattern, replacement in synonyms.items():
-            normalized = re.sub(pattern, replacement, normalized)
-        
-        return normalized
+        # 替换常见的同义词（单次扫描）
+        replacements = self._synonym_replacements
+        return self._synonym_pattern.sub(
+            lambda match: replacements[match.lastindex - 1], normalized
+        )
     
     def _extract_entities(self, doc) -> Dict[str, List[str]]:
         """提取实体"""
@@ -244,27 +275,32 @@ class IntentRecognizer:
                 for intent, score in action_scores[action].items():
                     intent_scores[intent] += score
         
-        # 基于关键短语评分
-        phrase_patterns = {
-            r'add.*tag': IntentType.BULK_TAG,
-            r'retag.*all': IntentType.BULK_RETAG,
-            r'delete.*all': IntentType.DELETE_HINATA,
-            r'clean.*up': IntentType.CLEANUP,
-            r'merge.*duplicate': IntentType.MERGE_DUPLICATE,
-            r'organize.*by': IntentType.REORGANIZE,
-            r'update.*note': IntentType.UPDATE_HINATA,
-            r'create.*new': IntentType.CREATE_HINATA
-        }
+        # 基于关键短语评分：逐行记录每个关键词最早结束位置与最晚起始位置。
+        # 正则"前词.*后词"中的.不匹配换行，前后词须出现在同一行
+        found: Set[str] = set()
+        matched_phrases: Set[Tuple[str, str, IntentType]] = set()
+        for line in text.split('\n'):
+            first_end: Dict[str, int] = {}
+            last_start: Dict[str, int] = {}
+            for end_index, keyword in self._phrase_ac.iter(line):
+                if keyword not in first_end:
+                    first_end[keyword] = end_index + 1
+                last_start[keyword] = end_index + 1 - len(keyword)
+            found.update(first_end)
+            
+            for phrase in self._PHRASE_PATTERNS:
+                first, second, _ = phrase
+                if first in first_end and second in last_start and first_end[first] <= last_start[second]:
+                    matched_phrases.add(phrase)
         
-        for pattern, intent in phrase_patterns.items():
-            if re.search(pattern, text):
-                intent_scores[intent] += 0.5
+        for _, _, intent in matched_phrases:
+            intent_scores[intent] += 0.5
         
         # 基于上下文评分
-        if 'all' in text and ('tag' in actions or 'label' in actions):
+        if 'all' in found and ('tag' in actions or 'label' in actions):
             intent_scores[IntentType.BULK_TAG] += 0.3
         
-        if 'duplicate' in text or 'same' in text:
+        if 'duplicate' in found or 'same' in found:
             intent_scores[IntentType.MERGE_DUPLICATE] += 0.4
         
         # 选择最高分的意图
@@ -14,7 +14,7 @@ import hashlib
 import gzip
 import pickle
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Tuple, Any, Set
+from typing import Dict, List, Optional, Tuple, Any, Set, Union
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
@@ -63,7 +63,7 @@ class RetrievalQuery:
     user_id: str
     query_type: str
     query_text: Optional[str] = None
-    semantic_vector: Optional[List[float]] = None
+    semantic_vector: Optional[Union[List[float], np.ndarray]] = None
     filters: Dict[str, Any] = field(default_factory=dict)
     time_range: Optional[Tuple[datetime, datetime]] = None
     limit: int = 10
@@ -149,6 +149,19 @@ class HotStorageManager:
         
         return None
     
+    async def get_hinata_many(self, hinata_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """一次MGET批量获取热数据层HiNATA，返回 id -> 数据"""
+        compressed_items = await self.redis_pool.mget([f"hinata:full:{hinata_id}" for hinata_id in hinata_ids])
+        
+        found = {}
+        for hinata_id, compressed_data in zip(hinata_ids, compressed_items):
+            if compressed_data:
+                try:
+                    found[hinata_id] = json.loads(gzip.decompress(compressed_data).decode())
+                except Exception:
+                    continue
+        return found
+    
     async def query_by_user_weight(self, user_id: str, limit: int = 10, min_weight: float = 0.5) -> List[str]:
         """按用户权重查询"""
         hinata_ids = await self.redis_pool.zrevrangebyscore(
@@ -337,6 +350,14 @@ class WarmStorageManager:
                 return dict(row)
             return None
     
+    async def get_hinata_many(self, hinata_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """一次查询批量获取温数据层HiNATA，返回 id -> 数据"""
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                'SELECT * FROM hinata_data WHERE id = ANY($1::text[])', hinata_ids
+            )
+            return {row['id']: dict(row) for row in rows}
+    
     async def query_by_criteria(self, user_id: str, criteria: Dict[str, Any]) -> List[str]:
         """基于复合条件查询"""
         async with self.db_pool.acquire() as conn:
@@ -650,7 +671,7 @@ class VectorIndexManager:
             ids=[hinata_data['id']]
         )
     
-    async def semantic_search(self, query_vector: List[float], user_id: str, 
+    async def semantic_search(self, query_vector: Union[List[float], np.ndarray], user_id: str, 
                             top_k: int = 10, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """语义搜索"""
         collection = self.get_user_collection(user_id)
@@ -952,13 +973,60 @@ class StorageEngine:
         
         return hinata_data
     
+    async def retrieve_hinata_many(self, hinata_ids: List[str], user_id: str) -> Dict[str, Dict[str, Any]]:
+        """批量检索HiNATA，每个存储层各一次往返，返回 id -> 数据"""
+        start_time = time.time()
+        found = {}
+        
+        # 检查缓存
+        for hinata_id in hinata_ids:
+            cached = self.cache.get(f"{user_id}:{hinata_id}")
+            if cached and start_time - cached[1] < self.cache_ttl:
+                found[hinata_id] = cached[0]
+        cache_hits = sum(1 for hinata_id in hinata_ids if hinata_id in found)
+        
+        # 按存储层级顺序批量查找
+        missing = [hinata_id for hinata_id in hinata_ids if hinata_id not in found]
+        loaded = {}
+        if missing:
+            loaded.update(await self.hot_storage.get_hinata_many(missing))
+            missing = [hinata_id for hinata_id in missing if hinata_id not in loaded]
+        if missing:
+            loaded.update(await self.warm_storage.get_hinata_many(missing))
+            missing = [hinata_id for hinata_id in missing if hinata_id not in loaded]
+        # 冷数据层基于文件，逐个查找
+        for hinata_id in missing:
+            hinata_data = await self.cold_storage.get_hinata(hinata_id, user_id)
+            if hinata_data:
+                loaded[hinata_id] = hinata_data
+        
+        # 更新缓存
+        for hinata_id, hinata_data in loaded.items():
+            self.cache[f"{user_id}:{hinata_id}"] = (hinata_data, time.time())
+        found.update(loaded)
+        
+        # 更新指标
+        retrieval_time = time.time() - start_time
+        self.metrics.average_retrieval_time = (
+            self.metrics.average_retrieval_time * 0.9 + retrieval_time * 0.1
+        )
+        
+        # 与逐个检索相同：每次缓存命中记1、各层都未找到记0，合并为一次计算
+        not_found = sum(1 for hinata_id in hinata_ids if hinata_id not in found)
+        hit_decay = 0.9 ** cache_hits
+        self.metrics.cache_hit_rate = (
+            (self.metrics.cache_hit_rate * hit_decay + (1.0 - hit_decay)) * 0.9 ** not_found
+        )
+        
+        return found
+    
     async def multi_strategy_search(self, query: RetrievalQuery) -> List[RetrievalResult]:
         """多策略检索"""
         start_time = time.time()
         all_candidates = set()
         
         # 策略1: 语义相似性检索
-        if query.semantic_vector:
+        if query.semantic_vector is not None and len(query.semantic_vector):
             semantic_results = await self.vector_index.semantic_search(
                 query.semantic_vector, query.user_id, top_k=20, filters=query.filters
             )
@@ -1001,9 +1069,11 @@ class StorageEngine:
         """对检索结果进行排序和过滤"""
         results = []
         
+        # 批量获取候选HiNATA数据
+        hinata_by_id = await self.retrieve_hinata_many(hinata_ids, query.user_id)
+        
         for hinata_id in hinata_ids:
-            # 获取HiNATA数据
-            hinata_data = await self.retrieve_hinata(hinata_id, query.user_id)
+            hinata_data = hinata_by_id.get(hinata_id)
             if not hinata_data:
                 continue
             
@@ -42,6 +42,23 @@ class OperationRisk(Enum):
     CRITICAL = "critical"  # 删除或不可逆操作
 
 
+class PermissionDenyReason(str, Enum):
+    """权限验证结果原因"""
+    GRANTED = "Permission granted"
+    PROFILE_NOT_FOUND = "User permission profile not found"
+    NO_WRITE = "No write permissions"
+    READ_ONLY = "Read-only access"
+    OPERATION_NOT_PERMITTED = "Operation not permitted"
+    OPERATION_FORBIDDEN = "Operation is forbidden"
+    NOT_YET_ACTIVE = "Permissions not yet active"
+    EXPIRED = "Permissions expired"
+    DAILY_LIMIT_EXCEEDED = "Daily operation limit exceeded"
+    BATCH_SIZE_EXCEEDED = "Batch size limit exceeded"
+    ADMIN_REQUIRED = "Admin permissions required for critical operations"
+    FULL_WRITE_REQUIRED = "Full write permissions required for high-risk operations"
+    TWO_FACTOR_REQUIRED = "Two-factor authentication required"
+
+
 @dataclass
 class UserPermissionProfile:
     """用户权限配置"""
@@ -196,6 +213,9 @@ class RiskAssessment:
 class PermissionValidator:
     """权限验证器"""
     
+    # 新审计记录在Redis中的缓存时间，覆盖预览到用户确认执行的窗口
+    AUDIT_CACHE_TTL = 600
+    
     def __init__(self, db_pool, redis_pool):
         self.db_pool = db_pool
         self.redis_pool = redis_pool
@@ -203,50 +223,50 @@ class PermissionValidator:
     
     async def validate_write_permission(self, user_id: str, operation_type: str, 
                                       operation_data: Dict[str, Any], 
-                                      context: Dict[str, Any]) -> Tuple[bool, str, List[str]]:
+                                      context: Dict[str, Any]) -> Tuple[bool, PermissionDenyReason, List[str]]:
         """验证写入权限"""
         
         # 1. 获取用户权限配置
         user_profile = await self.get_user_permission_profile(user_id)
         if not user_profile:
-            return False, "User permission profile not found", []
+            return False, PermissionDenyReason.PROFILE_NOT_FOUND, []
         
         # 2. 检查基础权限
         if user_profile.permission_level == PermissionLevel.NONE:
-            return False, "No write permissions", []
+            return False, PermissionDenyReason.NO_WRITE, []
         
         if user_profile.permission_level == PermissionLevel.READ_ONLY:
-            return False, "Read-only access", []
+            return False, PermissionDenyReason.READ_ONLY, []
         
         # 3. 检查操作是否被允许
         if operation_type not in user_profile.allowed_operations:
-            return False, f"Operation '{operation_type}' not permitted", []
+            return False, PermissionDenyReason.OPERATION_NOT_PERMITTED, []
         
         # 4. 检查禁止操作
         if user_profile.forbidden_operations and operation_type in user_profile.forbidden_operations:
-            return False, f"Operation '{operation_type}' is forbidden", []
+            return False, PermissionDenyReason.OPERATION_FORBIDDEN, []
         
         # 5. 检查时间有效性
         current_time = datetime.now(timezone.utc)
         valid_from = datetime.fromisoformat(user_profile.valid_from.replace('Z', '+00:00'))
         
         if current_time < valid_from:
-            return False, "Permissions not yet active", []
+            return False, PermissionDenyReason.NOT_YET_ACTIVE, []
         
         if user_profile.valid_until:
             valid_until = datetime.fromisoformat(user_profile.valid_until.replace('Z', '+00:00'))
             if current_time > valid_until:
-                return False, "Permissions expired", []
+                return False, PermissionDenyReason.EXPIRED, []
         
         # 6. 检查操作限制
         daily_count = await self.get_daily_operation_count(user_id)
         if daily_count >= user_profile.daily_operation_limit:
-            return False, "Daily operation limit exceeded", []
+            return False, PermissionDenyReason.DAILY_LIMIT_EXCEEDED, []
         
         # 7. 检查批量操作限制
         affected_count = operation_data.get("estimated_affected_count", 1)
         if affected_count > user_profile.batch_size_limit:
-            return False, f"Batch size limit exceeded ({affected_count} > {user_profile.batch_size_limit})", []
+            return False, PermissionDenyReason.BATCH_SIZE_EXCEEDED, []
         
         # 8. 风险评估
         risk_level, risk_score, risk_flags = self.risk_assessor.assess_operation_risk(
@@ -256,18 +276,18 @@ class PermissionValidator:
         # 9. 基于风险级别的权限检查
         if risk_level == OperationRisk.CRITICAL:
             if user_profile.permission_level != PermissionLevel.ADMIN:
-                return False, "Admin permissions required for critical operations", risk_flags
+                return False, PermissionDenyReason.ADMIN_REQUIRED, risk_flags
         
         elif risk_level == OperationRisk.HIGH:
             if user_profile.permission_level not in [PermissionLevel.WRITE_FULL, PermissionLevel.ADMIN]:
-                return False, "Full write permissions required for high-risk operations", risk_flags
+                return False, PermissionDenyReason.FULL_WRITE_REQUIRED, risk_flags
         
         # 10. 2FA检查
         if user_profile.require_2fa and risk_level in [OperationRisk.HIGH, OperationRisk.CRITICAL]:
             if not await self.verify_2fa_for_operation(user_id, context.get("session_id")):
-                return False, "Two-factor authentication required", risk_flags
+                return False, PermissionDenyReason.TWO_FACTOR_REQUIRED, risk_flags
         
-        return True, "Permission granted", risk_flags
+        return True, PermissionDenyReason.GRANTED, risk_flags
     
     async def get_user_permission_profile(self, user_id: str) -> Optional[UserPermissionProfile]:
         """获取用户权限配置"""
@@ -390,7 +410,7 @@ class PermissionValidator:
     
     async def log_operation_audit(self, user_id: str, operation_type: str, 
                                 operation_data: Dict[str, Any], context: Dict[str, Any],
-                                permission_result: Tuple[bool, str, List[str]],
+                                permission_result: Tuple[bool, PermissionDenyReason, List[str]],
                                 execution_result: Optional[Dict[str, Any]] = None) -> str:
         """记录操作审计日志"""
         
@@ -442,6 +462,21 @@ class PermissionValidator:
                 audit_log.risk_score, json.dumps(audit_log.security_flags or [])
             )
         
+        # 写穿缓存：确认执行时按ID直接读取，operation_details与数据库中一样保存为JSON文本
+        await self.redis_pool.setex(
+            f"audit:{log_id}",
+            self.AUDIT_CACHE_TTL,
+            json.dumps({
+                "log_id": log_id,
+                "user_id": user_id,
+                "operation_type": operation_type,
+                "operation_details": json.dumps(audit_log.operation_details),
+                "permission_check_result": audit_log.permission_check_result,
+                "risk_level": audit_log.risk_level.value,
+                "requested_at": audit_log.requested_at
+            })
+        )
+        
         return log_id
 
 
@@ -522,7 +557,7 @@ class WritePermissionManager:
     
     async def validate_and_audit_operation(self, user_id: str, operation_type: str,
                                          operation_data: Dict[str, Any],
-                                         context: Dict[str, Any]) -> Tuple[bool, str, str]:
+                                         context: Dict[str, Any]) -> Tuple[bool, PermissionDenyReason, str]:
         """验证权限并记录审计"""
         
         # 权限验证
@@ -603,6 +638,18 @@ class WritePermissionManager:
             rows = await conn.fetch(query, *params)
             return [dict(row) for row in rows]
     
+    async def get_audit_log(self, audit_id: str) -> Optional[Dict[str, Any]]:
+        """按ID获取审计记录：优先读取Redis中的写穿缓存，过期后回退到数据库"""
+        cached = await self.redis_pool.get(f"audit:{audit_id}")
+        if cached:
+            return json.loads(cached)
+        
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT * FROM operation_audit_logs WHERE log_id = $1", audit_id
+            )
+            return dict(row) if row else None
+    
     async def close(self):
         """关闭连接"""
         if self.db_pool:
@@ -640,7 +687,7 @@ async def main():
     )
     
     print(f"Permission check: {allowed}")
-    print(f"Reason: {reason}")
+    print(f"Reason: {reason.value}")
     print(f"Audit ID: {audit_id}")
     
     await manager.close()
@@ -0,0 +1,134 @@
+"""
+IntentRecognizer 单元测试
+同义词归一化和关键短语评分与原先逐条正则实现的输出保持一致
+"""
+
+import re
+
+import pytest
+
+intent_module = pytest.importorskip("InterfaceAbstraction.APIs.IntentRecognizer")
+IntentRecognizer = intent_module.IntentRecognizer
+IntentType = intent_module.IntentType
+
+
+# 原实现：逐条re.sub归一化
+_LEGACY_SYNONYMS = {
+    r'\b(notes?|annotations?)\b': 'hinata',
+    r'\b(remove|delete|get rid of)\b': 'delete',
+    r'\b(modify|change|edit|update)\b': 'update',
+    r'\b(add|create|make)\b': 'create',
+    r'\b(tag|label|categorize)\b': 'tag',
+    r'\b(all my|my entire|everything)\b': 'all',
+    r'\b(about|regarding|related to)\b': 'about'
+}
+
+# 原实现：逐条re.search关键短语
+_LEGACY_PHRASES = {
+    r'add.*tag': IntentType.BULK_TAG,
+    r'retag.*all': IntentType.BULK_RETAG,
+    r'delete.*all': IntentType.DELETE_HINATA,
+    r'clean.*up': IntentType.CLEANUP,
+    r'merge.*duplicate': IntentType.MERGE_DUPLICATE,
+    r'organize.*by': IntentType.REORGANIZE,
+    r'update.*note': IntentType.UPDATE_HINATA,
+    r'create.*new': IntentType.CREATE_HINATA
+}
+
+_LEGACY_ACTION_SCORES = {
+    'create': {IntentType.CREATE_HINATA: 0.8},
+    'add': {IntentType.CREATE_HINATA: 0.6, IntentType.BULK_TAG: 0.4},
+    'update': {IntentType.UPDATE_HINATA: 0.8},
+    'modify': {IntentType.UPDATE_HINATA: 0.7},
+    'change': {IntentType.UPDATE_HINATA: 0.6},
+    'delete': {IntentType.DELETE_HINATA: 0.9},
+    'remove': {IntentType.DELETE_HINATA: 0.8},
+    'tag': {IntentType.BULK_TAG: 0.8},
+    'label': {IntentType.BULK_TAG: 0.7},
+    'categorize': {IntentType.BULK_TAG: 0.7},
+    'organize': {IntentType.REORGANIZE: 0.8},
+    'reorganize': {IntentType.REORGANIZE: 0.9},
+    'merge': {IntentType.MERGE_DUPLICATE: 0.8},
+    'clean': {IntentType.CLEANUP: 0.7},
+    'cleanup': {IntentType.CLEANUP: 0.8}
+}
+
+
+def legacy_normalize(user_input):
+    normalized = user_input.lower()
+    for pattern, replacement in _LEGACY_SYNONYMS.items():
+        normalized = re.sub(pattern, replacement, normalized)
+    return normalized
+
+
+def legacy_classify(text, actions):
+    intent_scores = {intent: 0.0 for intent in (
+        IntentType.CREATE_HINATA, IntentType.UPDATE_HINATA, IntentType.DELETE_HINATA,
+        IntentType.BULK_TAG, IntentType.BULK_RETAG, IntentType.REORGANIZE,
+        IntentType.MERGE_DUPLICATE, IntentType.CLEANUP
+    )}
+    for action in actions:
+        for intent, score in _LEGACY_ACTION_SCORES.get(action, {}).items():
+            intent_scores[intent] += score
+    for pattern, intent in _LEGACY_PHRASES.items():
+        if re.search(pattern, text):
+            intent_scores[intent] += 0.5
+    if 'all' in text and ('tag' in actions or 'label' in actions):
+        intent_scores[IntentType.BULK_TAG] += 0.3
+    if 'duplicate' in text or 'same' in text:
+        intent_scores[IntentType.MERGE_DUPLICATE] += 0.4
+    best_intent = max(intent_scores.items(), key=lambda x: x[1])
+    if best_intent[1] < 0.3:
+        return IntentType.NONE, 0.0
+    return best_intent[0], min(best_intent[1], 1.0)
+
+
+INPUTS = [
+    "Add a tag to all my notes about Python",
+    "Please retag all of the annotations",
+    "delete all notes related to the old project",
+    "Get rid of everything regarding meetings",
+    "clean up my entire knowledge base",
+    "merge duplicate notes that say the same thing",
+    "organize by topic",
+    "Update the note about the deadline",
+    "create a new note",
+    "make new labels and categorize them",
+    "tag all small files",
+    "up clean",
+    "by organize",
+    "add\ntag",
+    "retag\nall of them",
+    "clean\nup the workspace",
+    "merge these\nduplicates",
+    "add a tag\nand also\ndelete all",
+    "tagadd tag",
+    "",
+    "nothing relevant here",
+]
+
+ACTIONS = [[], ['tag'], ['add', 'tag'], ['delete'], ['merge', 'clean'], ['label', 'organize']]
+
+
+@pytest.fixture
+def recognizer(monkeypatch):
+    """不加载spaCy模型：归一化和意图评分不依赖语言模型"""
+    monkeypatch.setattr(intent_module.spacy, "load", lambda name: None)
+    return IntentRecognizer()
+
+
+@pytest.mark.parametrize("user_input", INPUTS)
+def test_normalize_matches_legacy(recognizer, user_input):
+    assert recognizer._normalize_input(user_input) == legacy_normalize(user_input)
+
+
+@pytest.mark.parametrize("actions", ACTIONS)
+@pytest.mark.parametrize("user_input", INPUTS)
+def test_classify_matches_legacy(recognizer, user_input, actions):
+    for text in (user_input.lower(), legacy_normalize(user_input)):
+        assert recognizer._classify_intent(text, actions, {}) == legacy_classify(text, actions)
+
+
+def test_phrase_does_not_cross_newline(recognizer):
+    assert recognizer._classify_intent("clean\nup", [], {}) == (IntentType.NONE, 0.0)
+    assert recognizer._classify_intent("clean up", [], {}) == (IntentType.CLEANUP, 0.5)
@@ -0,0 +1,34 @@
+"""
+写入操作ID 单元测试
+保持原先"前缀_时间_随机"格式的前缀约定，并保证唯一、按生成时间有序
+"""
+
+import re
+import time
+
+import pytest
+
+write_api_module = pytest.importorskip("InterfaceAbstraction.APIs.HiNATAWriteAPI")
+_make_operation_id = write_api_module._make_operation_id
+
+_OPERATION_ID = re.compile(r'^(write|delete|bulk)_[0-9a-f]{12}[0-9a-f]{8}[0-9a-f]{8}$')
+
+
+@pytest.mark.parametrize("prefix", ["write", "delete", "bulk"])
+def test_operation_id_format(prefix):
+    operation_id = _make_operation_id(prefix)
+    assert operation_id.startswith(f"{prefix}_")
+    assert _OPERATION_ID.match(operation_id)
+
+
+def test_operation_id_encodes_millisecond_clock():
+    before = time.time_ns() // 1_000_000
+    operation_id = _make_operation_id("write")
+    after = time.time_ns() // 1_000_000
+    assert before <= int(operation_id[len("write_"):][:12], 16) <= after
+
+
+def test_operation_ids_unique_and_ordered():
+    operation_ids = [_make_operation_id("write") for _ in range(10000)]
+    assert len(set(operation_ids)) == len(operation_ids)
+    assert operation_ids == sorted(operation_ids)
@@ -0,0 +1,92 @@
+"""
+PrivacyFilter 单元测试
+PII移除和主题抽象与原先递归/逐条判断实现的输出保持一致
+"""
+
+import re
+
+import pytest
+
+api_module = pytest.importorskip("InterfaceAbstraction.APIs.AppIntegrationAPI")
+PrivacyFilter = api_module.PrivacyFilter
+
+
+# 原实现：逐条re.sub，前一个模式替换后的文本是后一个模式的输入
+_LEGACY_PATTERNS = [
+    r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',
+    r'\b\d{3}-\d{2}-\d{4}\b',
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
+]
+
+
+def legacy_remove_pii(data):
+    """原实现：递归重建容器，对每个字符串依次执行各模式的正则替换"""
+    def clean_string(s):
+        for pattern in _LEGACY_PATTERNS:
+            s = re.sub(pattern, '[REDACTED]', s)
+        return s
+    
+    def clean_recursive(obj):
+        if isinstance(obj, dict):
+            return {k: clean_recursive(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [clean_recursive(item) for item in obj]
+        elif isinstance(obj, str):
+            return clean_string(obj)
+        else:
+            return obj
+    
+    return clean_recursive(data)
+
+
+def legacy_abstract_topic(topic):
+    """原实现：按优先级逐个判断子串"""
+    topic_lower = topic.lower()
+    if 'programming' in topic_lower or 'coding' in topic_lower:
+        return 'software development'
+    elif 'machine learning' in topic_lower or 'ai' in topic_lower:
+        return 'artificial intelligence'
+    elif 'design' in topic_lower:
+        return 'design'
+    else:
+        return 'general topic'
+
+
+PSP_CONTEXTS = [
+    {},
+    {'email': 'alice@example.com', 'short': 'a@b.c', 'count': 3},
+    {'goals': ['call 555-123-4567', 'card 1234 5678 9012 3456', 'ssn 123-45-6789']},
+    {'nested': {'items': [{'note': 'mail bob@test.org today'}, 'x', ['4444-3333-2222-1111']]}},
+    {'mixed': [1, None, 2.5, ('tuple', '555.123.4567'), 'plain text']},
+    {'edge': ['a@b.cc', '123456', '12345', '@@@@@@', '']},
+    # 单个交替模式与逐条替换结果不同的输入：重叠匹配、替换后才形成的新匹配
+    {'overlap': ['c.de 121234-1234 67899012 9012', 'x@1234456745671234.ab']},
+    {'unicode': ['１２３４ ５６７８ ９０１２ ３４５６', 'tel\u00a0555 123\u00a04567', 'ü@ä.de 555-123-4567']},
+]
+
+TOPICS = [
+    "Python programming", "Coding interviews", "Machine Learning basics", "AI ethics",
+    "UI design", "design of AI systems for coding", "gardening", "Chair making", "", "MAIL",
+]
+
+
+@pytest.fixture
+def privacy_filter():
+    return PrivacyFilter()
+
+
+@pytest.mark.parametrize("context", PSP_CONTEXTS)
+def test_remove_pii_matches_legacy(privacy_filter, context):
+    assert privacy_filter._remove_pii(context) == legacy_remove_pii(context)
+
+
+def test_remove_pii_does_not_mutate_input(privacy_filter):
+    context = {'nested': {'items': ['alice@example.com']}}
+    privacy_filter._remove_pii(context)
+    assert context == {'nested': {'items': ['alice@example.com']}}
+
+
+@pytest.mark.parametrize("topic", TOPICS)
+def test_abstract_topic_matches_legacy(privacy_filter, topic):
+    assert privacy_filter._abstract_topic(topic) == legacy_abstract_topic(topic)
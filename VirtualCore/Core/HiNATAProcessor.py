@@ -12,7 +12,7 @@ import time
 import hashlib
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from enum import Enum
 
 import aioredis
@@ -21,6 +21,18 @@ from sentence_transformers import SentenceTransformer
 import spacy
 
 
+# 批量COPY写入时的列顺序，与单行INSERT保持一致
+HINATA_DATA_COLUMNS = [
+    'id', 'user_id', 'timestamp', 'source', 'highlight', 'note', 'address', 'tags', 'access_level',
+    'enhanced_tags', 'quality_score', 'attention_weight', 'psp_influence_weight',
+    'embedding_vector', 'processing_metadata'
+]
+HINATA_INDEX_COLUMNS = [
+    'hinata_id', 'user_id', 'timestamp', 'source', 'psp_influence_weight',
+    'attention_weight', 'quality_score', 'storage_tier', 'tags', 'content_hash'
+]
+
+
 class HiNATAProcessingStatus(Enum):
     """HiNATA处理状态"""
     RECEIVED = "received"
@@ -614,6 +626,21 @@ class AttentionWeightCalculator:
 class HiNATAProcessor:
     """HiNATA处理引擎主类"""
     
+    # 批量COPY失败时逐条写入所用的语句，列顺序同HINATA_DATA_COLUMNS/HINATA_INDEX_COLUMNS
+    INSERT_DATA_SQL = '''
+        INSERT INTO hinata_data 
+        (id, user_id, timestamp, source, highlight, note, address, tags, access_level,
+         enhanced_tags, quality_score, attention_weight, psp_influence_weight, 
+         embedding_vector, processing_metadata)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
+    '''
+    INSERT_INDEX_SQL = '''
+        INSERT INTO hinata_index 
+        (hinata_id, user_id, timestamp, source, psp_influence_weight, 
+         attention_weight, quality_score, storage_tier, tags, content_hash)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+    '''
+    
     def __init__(self, redis_url: str, postgres_dsn: str):
         self.validator = HiNATAValidator()
         self.enhancer = AIEnhancer()
@@ -632,32 +659,47 @@ class HiNATAProcessor:
         self.attention_calculator = AttentionWeightCalculator(self.db_pool)
     
     async def process_hinata_batch(self, hinata_batch: List[Dict[str, Any]], user_id: str) -> List[ProcessingResult]:
-        """批量处理HiNATA数据"""
-        results = []
+        """批量处理HiNATA数据，整批处理完后一次性写入数据库"""
+        results: List[Optional[ProcessingResult]] = [None] * len(hinata_batch)
+        prepared = []  # (结果位置, HiNATA, 开始时间)
         
-        for hinata_dict in hinata_batch:
+        for position, hinata_dict in enumerate(hinata_batch):
             start_time = time.time()
             
             try:
-                result = await self._process_single_hinata(hinata_dict, user_id)
-                processing_time = time.time() - start_time
-                result.processing_time = processing_time
-                results.append(result)
+                hinata = await self._prepare_hinata(hinata_dict, user_id)
+                prepared.append((position, hinata, start_time))
                 
             except Exception as e:
                 processing_time = time.time() - start_time
-                error_result = ProcessingResult(
+                results[position] = ProcessingResult(
                     status=HiNATAProcessingStatus.FAILED,
                     hinata_id=hinata_dict.get('id', 'unknown'),
                     processing_time=processing_time,
                     error_message=str(e)
                 )
-                results.append(error_result)
+        
+        if prepared:
+            try:
+                errors = await self._store_and_index_batch([hinata for _, hinata, _ in prepared], user_id)
+            except Exception as e:
+                # 无法获取数据库连接等整体失败
+                errors = [str(e)] * len(prepared)
+            
+            finished_at = time.time()
+            for (position, hinata, start_time), error_message in zip(prepared, errors):
+                results[position] = ProcessingResult(
+                    status=HiNATAProcessingStatus.FAILED if error_message else HiNATAProcessingStatus.COMPLETED,
+                    hinata_id=hinata.id,
+                    processing_time=finished_at - start_time,
+                    error_message=error_message,
+                    enhancements_applied=None if error_message else hinata.processing_metadata['enhancements_applied']
+                )
         
         return results
     
-    async def _process_single_hinata(self, hinata_dict: Dict[str, Any], user_id: str) -> ProcessingResult:
-        """处理单个HiNATA"""
+    async def _prepare_hinata(self, hinata_dict: Dict[str, Any], user_id: str) -> HiNATAData:
+        """验证、增强并评分单个HiNATA，不涉及存储"""
         
         # 1. 验证格式
         is_valid, errors = self.validator.validate(hinata_dict)
@@ -693,15 +735,7 @@ class HiNATAProcessor:
             'enhancements_applied': ['semantic_tags', 'recommended_highlights', 'embedding', 'quality_score', 'attention_weight']
         }
         
-        # 8. 存储和索引
-        await self._store_and_index(enhanced_hinata, user_id)
-        
-        return ProcessingResult(
-            status=HiNATAProcessingStatus.COMPLETED,
-            hinata_id=enhanced_hinata.id,
-            processing_time=0.0,  # 将在外层设置
-            enhancements_applied=enhanced_hinata.processing_metadata['enhancements_applied']
-        )
+        return enhanced_hinata
     
     def _calculate_psp_influence_weight(self, quality_score: float, attention_weight: float) -> float:
         """计算PSP影响权重"""
@@ -714,22 +748,63 @@ class HiNATAProcessor:
         final_influence = min_influence + (max_influence - min_influence) * base_influence
         return final_influence
     
-    async def _store_and_index(self, hinata: HiNATAData, user_id: str):
-        """存储和建立索引"""
+    async def _store_and_index_batch(self, hinatas: List[HiNATAData], user_id: str) -> List[Optional[str]]:
+        """批量存储和建立索引，返回与输入一一对应的错误信息（成功为None）
         
-        # 确定存储层级
-        storage_tier = self._determine_storage_tier(hinata)
+        温/冷层数据与索引各用一次COPY写入；COPY失败时整批回滚，改为逐条写入以隔离出错的记录。
+        热层数据在数据库事务提交之后才写入Redis。
+        """
+        storage_tiers = [self._determine_storage_tier(hinata) for hinata in hinatas]
+        errors: List[Optional[str]] = [None] * len(hinatas)
         
-        # 存储数据
-        if storage_tier == "hot":
-            await self._store_in_hot_layer(hinata, user_id)
-        elif storage_tier == "warm":
-            await self._store_in_warm_layer(hinata, user_id)
-        else:
-            await self._store_in_cold_layer(hinata, user_id)
+        async with self.db_pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    # 冷数据层暂时也存储到PostgreSQL
+                    warm_records = [
+                        self._warm_record(hinata, user_id)
+                        for hinata, storage_tier in zip(hinatas, storage_tiers) if storage_tier != "hot"
+                    ]
+                    if warm_records:
+                        await conn.copy_records_to_table(
+                            'hinata_data', records=warm_records, columns=HINATA_DATA_COLUMNS
+                        )
+                    await conn.copy_records_to_table(
+                        'hinata_index',
+                        records=[
+                            self._index_record(hinata, user_id, storage_tier)
+                            for hinata, storage_tier in zip(hinatas, storage_tiers)
+                        ],
+                        columns=HINATA_INDEX_COLUMNS
+                    )
+            except Exception:
+                for position, (hinata, storage_tier) in enumerate(zip(hinatas, storage_tiers)):
+                    try:
+                        async with conn.transaction():
+                            if storage_tier != "hot":
+                                await conn.execute(self.INSERT_DATA_SQL, *self._warm_record(hinata, user_id))
+                            await conn.execute(
+                                self.INSERT_INDEX_SQL, *self._index_record(hinata, user_id, storage_tier)
+                            )
+                    except Exception as e:
+                        errors[position] = str(e)
+            
+            # 热层写入失败的记录撤回其索引行，保证报告失败的记录没有残留、可以安全重试
+            failed_hot_ids = []
+            for position, (hinata, storage_tier) in enumerate(zip(hinatas, storage_tiers)):
+                if storage_tier != "hot" or errors[position] is not None:
+                    continue
+                try:
+                    await self._store_in_hot_layer(hinata, user_id)
+                except Exception as e:
+                    errors[position] = str(e)
+                    failed_hot_ids.append(hinata.id)
+            if failed_hot_ids:
+                await conn.execute(
+                    "DELETE FROM hinata_index WHERE hinata_id = ANY($1::text[])", failed_hot_ids
+                )
         
-        # 建立索引
-        await self._build_indexes(hinata, user_id)
+        return errors
     
     def _determine_storage_tier(self, hinata: HiNATAData) -> str:
         """确定存储层级"""
@@ -746,7 +821,8 @@ class HiNATAProcessor:
     
     async def _store_in_hot_layer(self, hinata: HiNATAData, user_id: str):
         """存储到热数据层（Redis）"""
-        hinata_data = asdict(hinata)
+        # 只读序列化，直接使用实例字典，省去asdict的递归深拷贝
+        hinata_data = hinata.__dict__
         
         # 存储完整数据
         await self.redis_pool.setex(
@@ -768,51 +844,27 @@ class HiNATAProcessor:
                 {hinata.id: hinata.psp_influence_weight or 0}
             )
     
-    async def _store_in_warm_layer(self, hinata: HiNATAData, user_id: str):
-        """存储到温数据层（PostgreSQL）"""
-        async with self.db_pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO hinata_data 
-                (id, user_id, timestamp, source, highlight, note, address, tags, access_level,
-                 enhanced_tags, quality_score, attention_weight, psp_influence_weight, 
-                 embedding_vector, processing_metadata)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
-            ''', 
-                hinata.id, user_id, hinata.timestamp, hinata.source, 
-                hinata.highlight, hinata.note, hinata.address,
-                json.dumps(hinata.tag), hinata.access,
-                json.dumps(hinata.enhanced_tags or []),
-                hinata.quality_score, hinata.attention_weight, hinata.psp_influence_weight,
-                json.dumps(hinata.embedding_vector or []),
-                json.dumps(hinata.processing_metadata or {})
-            )
-    
-    async def _store_in_cold_layer(self, hinata: HiNATAData, user_id: str):
-        """存储到冷数据层（文件系统）"""
-        # 这里应该实现Parquet文件存储
-        # 为了简化，暂时也存储到PostgreSQL
-        await self._store_in_warm_layer(hinata, user_id)
+    def _warm_record(self, hinata: HiNATAData, user_id: str) -> Tuple:
+        """hinata_data表的一行，列顺序同HINATA_DATA_COLUMNS"""
+        return (
+            hinata.id, user_id, hinata.timestamp, hinata.source, 
+            hinata.highlight, hinata.note, hinata.address,
+            json.dumps(hinata.tag), hinata.access,
+            json.dumps(hinata.enhanced_tags or []),
+            hinata.quality_score, hinata.attention_weight, hinata.psp_influence_weight,
+            json.dumps(hinata.embedding_vector or []),
+            json.dumps(hinata.processing_metadata or {})
+        )
     
-    async def _build_indexes(self, hinata: HiNATAData, user_id: str):
-        """建立多维度索引"""
-        
-        # 这里应该调用向量数据库、全文搜索引擎等建立索引
-        # 为了简化，现在只在PostgreSQL中建立基础索引
-        
-        async with self.db_pool.acquire() as conn:
-            # 更新索引表
-            await conn.execute('''
-                INSERT INTO hinata_index 
-                (hinata_id, user_id, timestamp, source, psp_influence_weight, 
-                 attention_weight, quality_score, storage_tier, tags, content_hash)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-            ''',
-                hinata.id, user_id, hinata.timestamp, hinata.source,
-                hinata.psp_influence_weight, hinata.attention_weight, hinata.quality_score,
-                self._determine_storage_tier(hinata),
-                json.dumps((hinata.tag or []) + (hinata.enhanced_tags or [])),
-                hashlib.md5(f"{hinata.highlight}{hinata.note}".encode()).hexdigest()
-            )
+    def _index_record(self, hinata: HiNATAData, user_id: str, storage_tier: str) -> Tuple:
+        """hinata_index表的一行，列顺序同HINATA_INDEX_COLUMNS"""
+        return (
+            hinata.id, user_id, hinata.timestamp, hinata.source,
+            hinata.psp_influence_weight, hinata.attention_weight, hinata.quality_score,
+            storage_tier,
+            json.dumps((hinata.tag or []) + (hinata.enhanced_tags or [])),
+            hashlib.md5(f"{hinata.highlight}{hinata.note}".encode()).hexdigest()
+        )
     
     async def close(self):
         """关闭连接"""
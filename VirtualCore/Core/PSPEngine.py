@@ -780,6 +780,8 @@ class PSPEngine:
         # 缓存用户PSP
         self.psp_cache = {}
         self.cache_ttl = 3600  # 1小时
+        # 每个用户的PSP版本号，缓存中的PSP每次被替换时递增
+        self.psp_versions: Dict[str, int] = {}
     
     async def process_hinata_for_psp_update(self, hinata_data: Dict[str, Any], user_id: str) -> Dict[str, Any]:
         """处理HiNATA数据进行PSP更新"""
@@ -803,10 +805,7 @@ class PSPEngine:
         await self.save_user_psp(user_id, updated_psp)
         
         # 6. 更新缓存
-        self.psp_cache[user_id] = {
-            'psp': updated_psp,
-            'timestamp': time.time()
-        }
+        self._cache_psp(user_id, updated_psp)
         
         return {
             "status": "success",
@@ -828,17 +827,24 @@ class PSPEngine:
         psp = await self._load_psp_from_database(user_id)
         
         # 更新缓存
+        self._cache_psp(user_id, psp)
+        
+        return psp
+    
+    def _cache_psp(self, user_id: str, psp: PSPContext):
+        """写入PSP缓存并递增该用户的PSP版本号"""
         self.psp_cache[user_id] = {
             'psp': psp,
             'timestamp': time.time()
         }
-        
-        return psp
+        self.psp_versions[user_id] = self.psp_versions.get(user_id, 0) + 1
     
     async def get_psp_context_for_prompt(self, user_id: str, current_request: str = "") -> Dict[str, Any]:
-        """为prompt生成获取PSP上下文"""
+        """为prompt生成获取PSP上下文（附带psp_version，供下游按版本缓存派生结果）"""
         psp = await self.get_user_psp(user_id)
-        return self.context_generator.generate_prompt_context(psp, current_request)
+        context = self.context_generator.generate_prompt_context(psp, current_request)
+        context['psp_version'] = self.psp_versions.get(user_id, 0)
+        return context
     
     async def save_user_psp(self, user_id: str, psp: PSPContext):
         """保存用户PSP"""